@@ -0,0 +1,138 @@
+"""
+Compares decoding a synthetic Platform Notifications LevelDB the way parse_chromium_notifications used to (plyvel
+on a copy of the database, a new message per record, every key of the database) with reading it through lib/leveldb.py and the batched decoder,
+in process and on a pool of processes (--table-workers). The decoding itself is also timed on its own, scanning
+the wire format for the fields in the output against a full parse of every record.
+plyvel is only needed to create the database and for the comparison: pip install plyvel
+
+Run from the root of the repository:
+    python3 -m benchmarks.bench_notifications [notifications] [workers]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+import plyvel  # type: ignore
+from lib.a_pb2 import NotificationDatabaseDataProto  # type: ignore
+from lib.chromium import CLOSED_REASONS, NOTIFICATION_PREFIX, convert_time, decode_notifications  # type: ignore
+from lib.database import iter_batches, parallel_batches  # type: ignore
+from lib.leveldb import LevelDB  # type: ignore
+
+
+def create_notifications(path: str, notifications: int):
+    db = plyvel.DB(path, create_if_missing=True)
+    message = NotificationDatabaseDataProto()
+    with db.write_batch() as batch:
+        for i in range(notifications):
+            message.Clear()
+            message.persistent_notification_id = i
+            message.origin = f"https://push{i % 50}.example.com/"
+            message.num_clicks = i % 3
+            message.creation_time_millis = 1700000000000 + i
+            message.closed_reason = i % 3
+            data = message.notification_data
+            data.title = f"Notification {i}"
+            data.body = f"Body of notification {i} " * 4
+            data.lang = "en"
+            data.tag = f"tag{i % 100}"
+            data.icon = f"https://push{i % 50}.example.com/icon.png"
+            data.timestamp = 13350000000000000 + i * 1000
+            data.vibration_pattern.extend([200, 100, 200])
+            data.data = os.urandom(256)
+            for number in range(2):
+                action = data.actions.add()
+                action.action = f"action{number}"
+                action.title = f"Action {number}"
+            batch.put(f"DATA:https://push{i % 50}.example.com/\x00{i}".encode(), message.SerializeToString())
+        batch.put(b"NEXT_NOTIFICATION_ID", str(notifications).encode())
+    db.close()
+
+
+def per_record_path(path: str, workers: int):
+    """
+    A copy of the database opened with plyvel (which writes to it), and a new message for every record, iterating
+    every key of the database.
+    """
+    rows = []
+    with tempfile.TemporaryDirectory() as copy:
+        shutil.copytree(path, copy, dirs_exist_ok=True)
+        db = plyvel.DB(copy, create_if_missing=False)
+        for key, value in db:
+            if not key.startswith(NOTIFICATION_PREFIX):
+                continue
+            message = NotificationDatabaseDataProto()
+            message.ParseFromString(value)
+            rows.append([
+                message.notification_data.title, message.notification_data.lang, message.notification_data.body,
+                message.notification_data.tag, message.notification_data.icon, message.notification_data.silent,
+                message.notification_data.require_interaction, convert_time(int(message.notification_data.timestamp)),
+                message.notification_data.badge, message.notification_data.image, message.num_clicks,
+                message.creation_time_millis, CLOSED_REASONS.get(message.closed_reason), message.has_triggered, message.origin,
+            ])
+        db.close()
+    return rows
+
+
+def batched_path(path: str, workers: int):
+    values = (value for _, value in LevelDB(path).iterator(prefix=NOTIFICATION_PREFIX))
+    if workers > 1:
+        batches = parallel_batches(decode_notifications, iter_batches(values), workers)
+    else:
+        batches = map(decode_notifications, iter_batches(values))
+    return [row for batch in batches for row in batch]
+
+
+def full_parse(values: list, workers: int):
+    """A full parse of every record, into a reused message."""
+    message = NotificationDatabaseDataProto()
+    rows = []
+    for value in values:
+        message.ParseFromString(value)
+        data = message.notification_data
+        rows.append([
+            data.title, data.lang, data.body, data.tag, data.icon, data.silent, data.require_interaction,
+            convert_time(int(data.timestamp)), data.badge, data.image, message.num_clicks, message.creation_time_millis,
+            CLOSED_REASONS.get(message.closed_reason), message.has_triggered, message.origin,
+        ])
+    return rows
+
+
+def scan(values: list, workers: int):
+    return decode_notifications(values)
+
+
+def measure(function, path: str, workers: int = 1, repeat: int = 3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(path, workers)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    notifications = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+    with tempfile.TemporaryDirectory() as directory:
+        create_notifications(directory, notifications)
+        per_record_time, per_record_rows = measure(per_record_path, directory)
+        batched_time, batched_rows = measure(batched_path, directory)
+        parallel_time, parallel_rows = measure(batched_path, directory, workers)
+        values = [value for _, value in LevelDB(directory).iterator(prefix=NOTIFICATION_PREFIX)]
+        full_time, full_rows = measure(full_parse, values)
+        scan_time, scan_rows = measure(scan, values)
+
+    assert per_record_rows == batched_rows == parallel_rows == full_rows == scan_rows, "The decoders disagree"
+    print(f"notifications:        {notifications}")
+    print(f"per record:           {per_record_time:.3f}s ({per_record_time / notifications * 1e6:.2f} us/record)")
+    print(f"batched:              {batched_time:.3f}s ({batched_time / notifications * 1e6:.2f} us/record)")
+    print(f"batched, {workers:>2} workers: {parallel_time:.3f}s ({parallel_time / notifications * 1e6:.2f} us/record)")
+    print(f"speedup:              {per_record_time / batched_time:.2f}x, {per_record_time / parallel_time:.2f}x with {workers} workers")
+    print(f"decoding, full parse: {full_time:.3f}s ({full_time / notifications * 1e6:.2f} us/record)")
+    print(f"decoding, scan:       {scan_time:.3f}s ({scan_time / notifications * 1e6:.2f} us/record), {full_time / scan_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
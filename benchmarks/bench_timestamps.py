@@ -0,0 +1,75 @@
+"""
+Compares converting Chromium timestamps in Python (convert_time, the default) with converting them inside SQLite
+(--sql-timestamps) on a synthetic cookies table, which has four timestamp columns per row.
+
+Run from the root of the repository:
+    python3 -m benchmarks.bench_timestamps [rows]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from lib.chromium import convert_time  # type: ignore
+from lib.database import connect_database, fetch_batches  # type: ignore
+from lib.schema import select_columns  # type: ignore
+
+COLUMNS = ["creation_utc", "host_key", "name", "value", "expires_utc", "last_access_utc", "source_port", "last_update_utc"]
+TIMESTAMPS = ("creation_utc", "expires_utc", "last_access_utc", "last_update_utc")
+
+
+def create_cookies(path: str, rows: int):
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE cookies (creation_utc, host_key, top_frame_site_key, name, value, encrypted_value, path, expires_utc, is_secure, is_httponly, last_access_utc, has_expires, is_persistent, priority, samesite, source_scheme, source_port, last_update_utc)")
+    base = 13350000000000000
+    connection.executemany(
+        "INSERT INTO cookies VALUES (?, ?, '', ?, ?, ?, '/', ?, 1, 0, ?, 1, 1, 1, 0, 2, 443, ?)",
+        ((base + i * 1000003, f".site{i % 5000}.com", f"cookie{i}", f"value{i}", b"\0" * 64, base + i * 7, base + i * 5, base + i * 11) for i in range(rows)),
+    )
+    connection.commit()
+    connection.close()
+
+
+def python_path(connection):
+    out = []
+    for batch in fetch_batches(connection.execute(select_columns(connection, "cookies", COLUMNS))):
+        out.extend([convert_time(e[0]), e[1], e[2], e[3], convert_time(e[4]), convert_time(e[5]), e[6], convert_time(e[7])] for e in batch)
+    return out
+
+
+def sql_path(connection):
+    out = []
+    for batch in fetch_batches(connection.execute(select_columns(connection, "cookies", COLUMNS, timestamps=TIMESTAMPS))):
+        out.extend(list(e) for e in batch)
+    return out
+
+
+def measure(function, connection, repeat: int = 3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(connection)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    with tempfile.TemporaryDirectory() as directory:
+        database = os.path.join(directory, "Cookies")
+        create_cookies(database, rows)
+        connection = connect_database(database)
+        python_time, python_rows = measure(python_path, connection)
+        sql_time, sql_rows = measure(sql_path, connection)
+        connection.close()
+
+    assert python_rows == sql_rows, "SQLite and Python conversions disagree"
+    print(f"rows:                {rows}")
+    print(f"python convert_time: {python_time:.3f}s ({python_time / rows * 1e6:.2f} us/row)")
+    print(f"sqlite conversion:   {sql_time:.3f}s ({sql_time / rows * 1e6:.2f} us/row)")
+    print(f"speedup:             {python_time / sql_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from lib.output import ADDING_FORMATS, add_output, copy_added  # type: ignore
+
+# Bump when the output of any parser changes, so results cached by an older version are never reused
+# 2: the JSON and JSON Lines outputs only hold the rows of the unit itself, not those of earlier runs
+PARSER_VERSION = 2
+
+
+def cache_key(inputs: dict, options: dict) -> str:
+    """
+    Address a result by what it was computed from: the SHA-256 of every input, the parser version, and the options
+    that change the output (format, timestamp conversion, time zone, ...).
+    """
+    digests = {name: entry["sha256"] for name, entry in inputs.items()}  # Not the modification times, only the content
+    material = json.dumps({"version": PARSER_VERSION, "inputs": digests, "options": options}, sort_keys=True)
+    return hashlib.sha256(material.encode("UTF-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    Content addressed cache of parsed results, shared between runs and cases.
+    KAPE often collects the same profile more than once (the live volume and every Volume Shadow Copy), and those
+    databases are frequently byte-identical. Such a profile is parsed once, the next copies get the cached output.
+
+    Every entry is a directory named after its key, holding one file per output and an entry.json listing them.
+    Entries are written to a temporary directory first and renamed into place, so worker processes never see
+    half of an entry. When the cache grows past max_bytes, the least recently used entries are evicted.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def restore(self, key: str, destination) -> dict:
+        """
+        Copy the outputs of a cached entry to destination(artifact, extension), the path each output should get.
+        The JSON and JSON Lines outputs are added to the output that is already there, like a parse would.
+        Returns the restored {artifact: [paths]}, or None when the key isn't cached.
+        Everything is copied next to its destination first, so an entry that is evicted halfway through leaves the
+        outputs as they were.
+        """
+        entry = os.path.join(self.directory, key)
+        restored = {}
+        copies = []  # (copy, path, extension)
+        try:
+            with open(os.path.join(entry, "entry.json"), "r", encoding="UTF-8") as file:
+                artifacts = json.load(file)
+            for artifact, extensions in artifacts.items():
+                restored[artifact] = []
+                for extension in extensions:
+                    path = destination(artifact, extension)
+                    restored[artifact].append(path)
+                    copies.append((f"{path}.restore", path, extension))
+                    shutil.copyfile(os.path.join(entry, f"{artifact}.{extension}"), f"{path}.restore")
+            os.utime(entry)  # Mark the entry as recently used
+        except (OSError, ValueError):  # Not cached, or evicted by another process while it was being copied
+            for copy, _, _ in copies:
+                if os.path.exists(copy):
+                    os.remove(copy)
+            return None
+        for copy, path, extension in copies:
+            if extension in ADDING_FORMATS:
+                add_output(copy, path, extension)
+                os.remove(copy)
+            else:
+                os.replace(copy, path)
+        return restored
+
+    def store(self, key: str, outputs: dict, starts: dict = None):
+        """
+        Copy the outputs of a freshly parsed unit, {artifact: [paths]}, into the cache, then evict what doesn't fit.
+        Of the outputs in starts, {path: start} (see Checkpoint.starts), only the rows the unit added are copied.
+        """
+        starts = starts or {}
+        entry = os.path.join(self.directory, key)
+        if os.path.exists(entry):
+            return
+        staging = tempfile.mkdtemp(dir=self.directory, prefix=".staging-")
+        try:
+            artifacts = {}
+            for artifact, paths in outputs.items():
+                artifacts[artifact] = []
+                for path in paths:
+                    extension = path.rsplit(f"_{artifact}.", 1)[1]  # "json", but also "summary.json"
+                    if path in starts:
+                        copy_added(path, extension, starts[path], os.path.join(staging, f"{artifact}.{extension}"))
+                    else:
+                        shutil.copyfile(path, os.path.join(staging, f"{artifact}.{extension}"))
+                    artifacts[artifact].append(extension)
+            with open(os.path.join(staging, "entry.json"), "w", encoding="UTF-8") as file:
+                json.dump(artifacts, file)
+            os.rename(staging, entry)
+        except OSError:  # Cached by another process in the meantime, or the disk is full. The output itself is fine
+            shutil.rmtree(staging, ignore_errors=True)
+            return
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        for name in os.listdir(self.directory):
+            entry = os.path.join(self.directory, name)
+            if name.startswith(".") or not os.path.isdir(entry):
+                continue
+            try:
+                size = sum(os.path.getsize(os.path.join(entry, file)) for file in os.listdir(entry))
+                entries.append((os.path.getmtime(entry), size, entry))
+            except OSError:  # Evicted by another process
+                continue
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
@@ -0,0 +1,116 @@
+import os
+import sqlite3
+from lib.columnar import column_kind, convert_column, wider_kind  # type: ignore
+
+# Declared SQLite type of every kind of column (see lib/columnar.py)
+SQLITE_TYPES = {"timestamp": "TIMESTAMP", "bool": "INTEGER", "int": "INTEGER", "float": "REAL", "binary": "BLOB", "string": "TEXT"}
+# The kind of every declared type, booleans and integers are both INTEGER, and widen the same way
+DECLARED_KINDS = {"TIMESTAMP": "timestamp", "INTEGER": "int", "REAL": "float", "BLOB": "binary", "TEXT": "string"}
+
+# The parsers output some JSON values (extension permissions, ...) as they are, store those the way the CSV output does
+sqlite3.register_adapter(list, str)
+sqlite3.register_adapter(dict, str)
+
+# Columns that are indexed in the case database besides the timestamps, for "who visited this domain" questions
+INDEXED_COLUMNS = {"host", "host_key", "hostname", "origin", "site", "url", "download_url", "page_url", "top_level_url", "frame_url"}
+
+
+class Shard:
+    """
+    The tables of a single profile for the case database (--sqlite), one typed table per artifact.
+    Every worker writes the shards of its own profiles, so they never wait for each other's locks, and the parent
+    merges the shards into the case database once every profile is done (see merge_shards).
+    The shard is a scratch file until it is complete: no journal, a single transaction, renamed into place at the end.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.connection = sqlite3.connect(f"{path}.tmp", isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode = OFF")
+        self.connection.execute("PRAGMA synchronous = OFF")
+        self.connection.execute("BEGIN")
+
+    def tap(self, table: str, headers: list, batches):
+        """
+        Pass the batches through unchanged, inserting them into table as they go by.
+        The column types are those of the Parquet output: inferred from the first batch, and widened by a later value
+        that doesn't fit (see lib/columnar.py). A widened table is copied into one with the wider types at the end.
+        """
+        kinds = declared = None
+        for batch in batches:
+            if kinds is None:
+                kinds = [column_kind([entry[index] for entry in batch]) for index in range(len(headers))]
+                declared = list(kinds)
+                self.create(table, headers, kinds)
+                insert = f'INSERT INTO "{table}" VALUES ({", ".join("?" * len(headers))})'
+            kinds = [convert_column(kind, batch, index)[0] for index, kind in enumerate(kinds)]
+            self.connection.executemany(insert, batch)
+            yield batch
+        if kinds != declared:
+            self.connection.execute(f'ALTER TABLE "{table}" RENAME TO "{table}_narrow"')
+            self.create(table, headers, kinds)
+            self.connection.execute(f'INSERT INTO "{table}" SELECT * FROM "{table}_narrow"')
+            self.connection.execute(f'DROP TABLE "{table}_narrow"')
+
+    def create(self, table: str, headers: list, kinds: list):
+        columns = ", ".join(f'"{header}" {SQLITE_TYPES[kind]}' for header, kind in zip(headers, kinds))
+        self.connection.execute(f'CREATE TABLE "{table}" ({columns})')
+
+    def write(self):
+        self.connection.execute("COMMIT")
+        self.connection.close()
+        os.replace(f"{self.path}.tmp", self.path)
+
+    def close(self):
+        """Throw away a shard that wasn't written, a profile that failed halfway has no tables in the case database."""
+        if os.path.exists(f"{self.path}.tmp"):
+            self.connection.close()
+            os.remove(f"{self.path}.tmp")
+
+
+def merge_shards(path: str, shards: list):
+    """
+    Build the case database from the shards of every profile, as (user, browser, profile, shard path).
+    Every table gets user, browser and profile columns in front. The database is rebuilt from scratch every run, in WAL
+    mode with a single transaction per shard, and the indexes are built once every row is in, which is much faster
+    than keeping them up to date while inserting.
+    A column gets the type of the shard with the widest one, the same way a column of a single shard is widened, so
+    the TEXT values of one profile are never converted by the INTEGER type of another ("0123" to 123).
+    """
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(f"{path}{suffix}"):
+            os.remove(f"{path}{suffix}")
+    connection = sqlite3.connect(path, isolation_level=None)
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.execute("PRAGMA synchronous = NORMAL")
+    kinds = {}  # table: {column: kind}, in the column order of the table
+    for user, browser, profile, shard in shards:
+        connection.execute("ATTACH DATABASE ? AS shard", (shard,))
+        for (table,) in connection.execute("SELECT name FROM shard.sqlite_master WHERE type = 'table'").fetchall():
+            columns = kinds.setdefault(table, {})
+            for column in connection.execute(f'PRAGMA shard.table_info("{table}")').fetchall():
+                kind = DECLARED_KINDS[column[2]]
+                columns[column[1]] = wider_kind(columns[column[1]], kind) if column[1] in columns else kind
+        connection.execute("DETACH DATABASE shard")
+    tables = {table: [(column, SQLITE_TYPES[kind]) for column, kind in columns.items()] for table, columns in kinds.items()}
+    for table, columns in tables.items():
+        declared = ", ".join(f'"{column}" {declared}' for column, declared in columns)
+        connection.execute(f'CREATE TABLE "{table}" (user TEXT, browser TEXT, profile TEXT, {declared})')
+
+    for user, browser, profile, shard in shards:
+        connection.execute("ATTACH DATABASE ? AS shard", (shard,))
+        connection.execute("BEGIN")
+        for (table,) in connection.execute("SELECT name FROM shard.sqlite_master WHERE type = 'table'").fetchall():
+            connection.execute(f'INSERT INTO main."{table}" SELECT ?, ?, ?, * FROM shard."{table}"', (user, browser, profile))
+        connection.execute("COMMIT")
+        connection.execute("DETACH DATABASE shard")
+
+    connection.execute("BEGIN")
+    for table, columns in tables.items():
+        connection.execute(f'CREATE INDEX "{table}_profile" ON "{table}" (user, browser, profile)')
+        for column, declared in columns:
+            if declared == "TIMESTAMP" or column in INDEXED_COLUMNS:
+                connection.execute(f'CREATE INDEX "{table}_{column}" ON "{table}" ("{column}")')
+    connection.execute("COMMIT")
+    connection.execute("PRAGMA optimize")
+    connection.close()
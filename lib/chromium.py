@@ -0,0 +1,463 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+import os
+import json
+from google.protobuf.message import DecodeError
+from lib.a_pb2 import NotificationDatabaseDataProto  # type: ignore
+from lib.database import iter_batches, parallel_batches  # type: ignore
+from lib.leveldb import LevelDB  # type: ignore
+from lib.parser import BrowserParser  # type: ignore
+from lib.wire import LENGTH_DELIMITED, VARINT, scan_fields, signed  # type: ignore
+
+
+def convert_time(timestamp):
+    """Convert Chromium timestamp to standard datetime format."""
+    if timestamp is None:  # Column doesn't exist in the schema of this browser version
+        return None
+    chromium_base_date = datetime(1601, 1, 1)
+    timestamp_delta = timedelta(microseconds=timestamp)
+    return str(chromium_base_date + timestamp_delta)
+
+
+@dataclass(frozen=True)
+class ChromiumBrowser:
+    """
+    Describes a Chromium based browser.
+    They all share the same databases, so a single ChromiumParser handles every one of them, and only the
+    differences between the browsers (where the profile lives, quirks in the file layout) are kept here.
+    """
+    name: str  # Used in the output filenames
+    title: str  # Used in messages, and as the key returned by locate_browser_directories
+    user_data: str  # Relative to the AppData directory of the user
+    profile: str = "Default"  # The profile that is always there, next to "Profile 1", "Profile 2", ... and "Guest Profile"
+    # Newer versions keep the cookies in the Network directory, older versions in the root of the profile
+    cookies: tuple = ("Network/Cookies", "Cookies")
+    # Directories in Extensions that don't contain an extension
+    ignored_extensions: tuple = ("Temp",)
+
+
+CHROME = ChromiumBrowser("chrome", "Chrome", "Local/Google/Chrome/User Data")
+EDGE = ChromiumBrowser("edge", "Edge", "Local/Microsoft/Edge/User Data")
+OPERA = ChromiumBrowser("opera", "Opera", "Roaming/Opera Software/Opera Stable")
+BRAVE = ChromiumBrowser("brave", "Brave", "Local/BraveSoftware/Brave-Browser/User Data")
+# NOTE: Yandex uses different names than default chromium. Check the filenames and update accordingly
+YANDEX = ChromiumBrowser("yandex", "Yandex", "Local/Yandex/YandexBrowser/User Data")
+
+BROWSERS = (CHROME, EDGE, OPERA, BRAVE, YANDEX)
+
+
+# Key prefix of the notifications in the Platform Notifications LevelDB
+NOTIFICATION_PREFIX = b"DATA:"
+NOTIFICATION_HEADERS = ["title", "lang", "body", "tag", "icon", "is_silent", "require_interaction", "time", "badge", "image", "numClicks", "creation_time_millis", "closed_reason", "has_triggered", "origin"]
+# Notifications recovered from the LevelDB files, with whether they were deleted or overwritten, and the file they are in
+RECOVERED_HEADERS = NOTIFICATION_HEADERS + ["state", "source"]
+# Found in chromium source-code (https://source.chromium.org/chromium/chromium/src/+/main:content/browser/notifications/notification_database_data.proto) Line 16-20
+CLOSED_REASONS = {0: "USER", 1: "DEVELOPER", 2: "UKNOWN"}
+# The fields of NotificationDatabaseDataProto, and of its NotificationData, that are in the output (see lib/a_pb2.py)
+NOTIFICATION_FIELDS = {2: LENGTH_DELIMITED, 4: LENGTH_DELIMITED, 7: VARINT, 9: VARINT, 13: VARINT, 14: VARINT}
+NOTIFICATION_DATA_FIELDS = {1: LENGTH_DELIMITED, 3: LENGTH_DELIMITED, 4: LENGTH_DELIMITED, 5: LENGTH_DELIMITED, 6: LENGTH_DELIMITED, 7: VARINT, 11: VARINT, 12: VARINT, 14: LENGTH_DELIMITED, 15: LENGTH_DELIMITED}
+
+
+def text(fields: dict, number: int) -> str:
+    return fields[number].decode("utf-8") if number in fields else ""
+
+
+def scan_notification(value: bytes) -> list:
+    """
+    Pull the fields of a notification that are in the output straight from the wire format (see lib/wire.py), the
+    same row as the full parse. The vibration pattern, data and actions are skipped without being decoded.
+    """
+    fields = scan_fields(value, NOTIFICATION_FIELDS)
+    data = scan_fields(fields.get(4, b""), NOTIFICATION_DATA_FIELDS)
+    closed_reason = fields.get(13, 0)
+    return [
+        text(data, 1),
+        text(data, 3),
+        text(data, 4),
+        text(data, 5),
+        text(data, 6),
+        bool(data.get(7, 0)),
+        bool(data.get(11, 0)),
+        convert_time(signed(data.get(12, 0))),
+        text(data, 14),
+        text(data, 15),
+        signed(fields.get(7, 0), 32),
+        signed(fields.get(9, 0)),
+        CLOSED_REASONS[closed_reason if closed_reason in CLOSED_REASONS else 0],  # Unknown values read as the default
+        bool(fields.get(14, 0)),
+        text(fields, 2),
+    ]
+
+
+def decode_notifications(values: list) -> list:
+    """
+    Decode a batch of NotificationDatabaseDataProto records into rows.
+    Records are scanned for the fields in the output, and only parsed in full when the scan can't handle them. A
+    single message is reused for those, ParseFromString clears it before every record.
+    Defined at module level, so --table-workers can send the batches to other processes.
+    """
+    message = NotificationDatabaseDataProto()
+    rows = []
+    for value in values:
+        try:
+            rows.append(scan_notification(value))
+            continue
+        except (IndexError, ValueError):  # Damaged, invalid UTF-8 (a ValueError as well), or not laid out as expected
+            pass
+        message.ParseFromString(value)
+        data = message.notification_data
+        rows.append([
+            data.title,
+            data.lang,
+            data.body,
+            data.tag,
+            data.icon,
+            data.silent,
+            data.require_interaction,
+            convert_time(int(data.timestamp)),
+            data.badge,
+            data.image,
+            message.num_clicks,
+            message.creation_time_millis,
+            CLOSED_REASONS.get(message.closed_reason),
+            message.has_triggered,
+            message.origin,
+        ])
+    return rows
+
+
+def live_values(entries, recovered: list):
+    """The values of the live records of LevelDB.entries, the deleted and overwritten records are added to recovered."""
+    for state, record in entries:
+        if state == "live":
+            yield record.value
+        else:
+            recovered.append((state, record))
+
+
+def decode_recovered(records: list) -> list:
+    """
+    Decode a batch of recovered (state, record) notifications into rows, like decode_notifications.
+    A deleted record can be damaged, those are left out instead of failing the whole artifact: truncated, invalid
+    UTF-8 in a string (UnicodeDecodeError is a ValueError), or a timestamp out of range.
+    """
+    rows = []
+    for state, record in records:
+        try:
+            rows.extend(row + [state, record.source] for row in decode_notifications([record.value]))
+        except (DecodeError, ValueError, OverflowError):
+            continue
+    return rows
+
+
+class ChromiumParser(BrowserParser):
+    """Parses a single profile of any Chromium based browser."""
+
+    # The inputs parse_artifacts reads besides the cookies (see ChromiumBrowser.cookies), relative to the profile
+    family = "chromium"
+    inputs = ("History", "Favicons", "Shortcuts", "Platform Notifications", "Extensions/*/*/manifest.json")
+    delta_keys = {
+        "downloads": ("target_path", "start_time"),
+        "history": ("url",),
+        "visited_links": ("top_level_url", "frame_url"),
+        "cookies": ("host_key", "name"),
+        "shortcuts": ("text", "fill_into_edit"),
+        "notifications": ("origin", "creation_time_millis"),
+        "deleted_notifications": ("origin", "creation_time_millis", "time", "state"),
+        "extensions": ("name",),
+    }
+    timeline_events = {
+        "downloads": (("start_time", "end_time"), ("target_path", "mime_type")),
+        "history": (("last_visit_time",), ("url", "title")),
+        "cookies": (("created_utc", "last_access_utc"), ("host_key", "name")),
+        "shortcuts": (("last_access_time",), ("text", "contents")),
+        "notifications": (("time",), ("origin", "title", "body")),
+        "deleted_notifications": (("time",), ("state", "origin", "title", "body")),
+    }
+    search_columns = {
+        "downloads": ("target_path", "mime_type"),
+        "history": ("url", "title"),
+        "searches": ("term",),
+        "shortcuts": ("text", "contents"),
+        "notifications": ("origin", "title", "body"),
+        "deleted_notifications": ("origin", "title", "body"),
+        "extensions": ("name", "description"),
+    }
+
+    def __init__(self, browser: ChromiumBrowser, user, directory, profile, output, args, checkpoint=None, delta=None):
+        super().__init__(user, directory, output, args, browser.name, profile, checkpoint, delta)
+        self.browser = browser
+        self.profile = profile
+        # With --sql-timestamps SQLite does the WebKit epoch conversion, and the rows arrive already formatted
+        self.convert_time = (lambda timestamp: timestamp) if args.sql_timestamps else convert_time
+
+    def sql_timestamps(self, *columns):
+        """The timestamp columns SQLite should convert, which is none of them unless --sql-timestamps is used."""
+        return columns if self.args.sql_timestamps else ()
+
+    def parse_downloads(self, database):
+        """Parse downloads data from the SQLite database and save it to a CSV file."""
+        connection = self.connections.get(database)
+        if not connection:
+            return None
+        try:
+            entries = self.select(database, "downloads", [
+                "current_path",
+                "target_path",
+                "start_time",
+                "received_bytes",
+                "total_bytes",
+                "end_time",
+                "opened",
+                "last_access_time",
+                "mime_type",
+            ], timestamps=self.sql_timestamps("start_time", "end_time", "last_access_time"))
+        except Exception as e:
+            print(e)
+            return 0
+        headers = [
+            "filename",
+            "current_path",
+            "target_path",
+            "start_time",
+            "received_bytes",
+            "total_bytes",
+            "end_time",
+            "opened",
+            "last_access_time",
+            "mime_type",
+        ]
+        batches = (
+            [
+                [
+                    entry[0].split("\\")[-1],
+                    entry[0],
+                    entry[1],
+                    self.convert_time(entry[2]),
+                    entry[3],
+                    entry[4],
+                    self.convert_time(entry[5]),
+                    str(bool(entry[6])),
+                    self.convert_time(entry[7]),
+                    entry[8],
+                ]
+                for entry in batch
+            ]
+            for batch in entries
+        )
+        self.write("downloads", headers, batches)
+
+    def parse_history(self, database):
+        """Parse browsing history data from the SQLite database and save it to a CSV file."""
+        connection = self.connections.get(database)
+        if not connection:
+            return None
+        try:
+            entries = self.select(database, "urls", ["url", "title", "visit_count", "last_visit_time"], timestamps=self.sql_timestamps("last_visit_time"))
+        except Exception as e:
+            print(e)
+            return 0
+        headers = ["url", "title", "visit_count", "last_visit_time"]
+        batches = (
+            [
+                [
+                    entry[0],
+                    entry[1] if not entry[0].startswith("file://") else entry[0].split("/")[-1],
+                    entry[2],
+                    self.convert_time(entry[3]),
+                ]
+                for entry in batch
+            ]
+            for batch in entries
+        )
+        self.write("history", headers, batches)
+
+    def parse_visited_links(self, database):
+        """Parse visited links data from the SQLite database and save it to a CSV file."""
+        connection = self.connections.get(database)
+        if not connection:
+            return None
+        try:
+            entries = self.select(database, "visited_links", ["top_level_url", "frame_url", "visit_count"])
+        except Exception as e:
+            print(e)
+            return 0
+        headers = ["top_level_url", "frame_url", "visit_count"]
+        self.write("visited_links", headers, entries)
+
+    def parse_searches(self, database):
+        """Parse search terms data from the SQLite database and save it to a CSV file."""
+        connection = self.connections.get(database)
+        if not connection:
+            return None
+        try:
+            entries = self.select(database, "keyword_search_terms", ["term", "normalized_term"])
+        except Exception as e:
+            print(e)
+            return 0
+        headers = ["term", "normalized_term"]
+        self.write("searches", headers, entries)
+
+    def parse_favicons(self, database):
+        """Parse favicons data from the SQLite database and save it to a CSV file."""
+        connection = self.connections.get(database)
+        if not connection:
+            return None
+        try:
+            entries = self.select(database, "favicons", ["url"])
+        except Exception as e:
+            print(e)
+            return 0
+        self.write("favicons", ["url"], entries)
+
+    def parse_cookies(self, database):
+        """Parse cookies from the SQLite database and save it to a CSV file"""
+
+        connection = self.connections.get(database)
+        if not connection:
+            return None
+        try:
+            # Explicitly leaves out encrypted_value, which is by far the largest column in the table
+            entries = self.select(database, "cookies", [
+                "creation_utc",
+                "host_key",
+                "name",
+                "value",
+                "expires_utc",
+                "last_access_utc",
+                "source_port",
+                "last_update_utc",
+            ], timestamps=self.sql_timestamps("creation_utc", "expires_utc", "last_access_utc", "last_update_utc"))
+        except Exception as e:
+            print(e)
+            return 0
+        headers = [
+            "created_utc",
+            "host_key",
+            "name",
+            "value",
+            "expires_utc",
+            "last_access_utc",
+            "source_port",
+            "last_update_utc",
+        ]
+        batches = (
+            [
+                [
+                    self.convert_time(entry[0]),
+                    entry[1],
+                    entry[2],
+                    entry[3],
+                    self.convert_time(entry[4]),
+                    self.convert_time(entry[5]),
+                    entry[6],
+                    self.convert_time(entry[7]),
+                ]
+                for entry in batch
+            ]
+            for batch in entries
+        )
+        self.write("cookies", headers, batches)
+
+    def parse_shortcuts(self, database):
+        """Parse shortcuts from the SQLite database and save it to a CSV file"""
+
+        connection = self.connections.get(database)
+        if not connection:
+            return None
+        try:
+            entries = self.select(database, "omni_box_shortcuts", [
+                "text",
+                "fill_into_edit",
+                "contents",
+                "keyword",
+                "last_access_time",
+                "number_of_hits",
+            ], timestamps=self.sql_timestamps("last_access_time"))
+        except Exception as e:
+            print(e)
+            return 0
+        headers = [
+            "text",
+            "fill_into_edit",
+            "contents",
+            "keyword",
+            "last_access_time",
+            "number_of_hits",
+        ]
+        batches = (
+            [
+                [
+                    entry[0],
+                    entry[1],
+                    entry[2],
+                    entry[3],
+                    self.convert_time(entry[4]),
+                    entry[5],
+                ]
+                for entry in batch
+            ]
+            for batch in entries
+        )
+        self.write("shortcuts", headers, batches)
+
+    def decode(self, function, records):
+        """Decode the records in batches with function, on --table-workers processes when there is more than one."""
+        if self.args.table_workers > 1:
+            return parallel_batches(function, iter_batches(records), self.args.table_workers)
+        return map(function, iter_batches(records))
+
+    def parse_chromium_notifications(self, database):
+        if os.path.exists(f"{database}"):
+            try:
+                # The LevelDB files are read as they are (see lib/leveldb.py), the evidence is never opened for writing
+                # Only the notifications themselves, not NEXT_NOTIFICATION_ID and the RESOURCES: records. The files are
+                # read once for both artifacts, the deleted and overwritten notifications that are still in the files,
+                # because they weren't compacted yet, are kept aside while the notifications are written
+                entries = LevelDB(database).entries(prefix=NOTIFICATION_PREFIX)
+                recovered = []
+                self.write("notifications", NOTIFICATION_HEADERS, self.decode(decode_notifications, live_values(entries, recovered)))
+                recovered.extend(entry for entry in entries if entry[0] != "live")  # Whatever the notifications left, like a --resume
+                self.write("deleted_notifications", RECOVERED_HEADERS, self.decode(decode_recovered, recovered))
+            except Exception as e:
+                print(e)
+                return 0
+
+    def parse_extensions(self, path):
+        if not os.path.exists(path):
+            return None
+        output = []
+        for extension in os.listdir(path):
+            if extension in self.browser.ignored_extensions:
+                continue
+            id = os.listdir(f"{path}/{extension}")[0]
+            manifest_path = f"{path}/{extension}/{id}/manifest.json"
+            if not os.path.exists(manifest_path):
+                return None
+            f = open(manifest_path, "r")
+            manifest = json.loads(f.read())
+            try:
+                output.append([manifest.get("name", "No name specified"), manifest.get("author", "No author specified"), manifest.get("manifest_version", "No version specified"), manifest.get("description", "No description specified"), manifest.get("developer", "No developer specified")])
+            except KeyError:
+                print(f"[!] Error parsing {self.writer.browser} extensions, check them manually!")
+        self.write("extensions", ["name", "author", "version", "description", "developer"], [output])
+
+    def parse_artifacts(self):
+        print(f"[*] Starting to parse {self.browser.title} profile {self.profile}")
+        directory = self.directory
+        cookies = next((f"{directory}/{path}" for path in self.browser.cookies if os.path.exists(f"{directory}/{path}")), None)
+        self.parse_downloads(f"{directory}/History")
+        self.parse_history(f"{directory}/History")
+        self.parse_visited_links(f"{directory}/History")
+        self.parse_searches(f"{directory}/History")
+        self.connections.close(f"{directory}/History")
+        self.parse_favicons(f"{directory}/Favicons")
+        if cookies:
+            self.parse_cookies(cookies)
+        self.parse_shortcuts(f"{directory}/Shortcuts")
+        self.parse_chromium_notifications(f"{directory}/Platform Notifications")
+        self.parse_extensions(f"{directory}/Extensions")
+
+
+def parse_chromium_data(browser: ChromiumBrowser, user, directory, profile, output, args, checkpoint=None, delta=None):
+    ChromiumParser(browser, user, directory, profile, output, args, checkpoint, delta).parse()
@@ -0,0 +1,138 @@
+import re
+from datetime import datetime
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # Only needed for --parquet and --arrow
+    pyarrow = None
+
+# String columns with few distinct values, stored once per row group with the rows referring to them by index
+DICTIONARY_COLUMNS = {"host", "host_key", "hostname", "mime_type", "visit_type", "type", "closed_reason", "origin", "site"}
+
+TIMESTAMP = re.compile(r"^\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}(\.\d{1,6})?$")
+
+
+def column_kind(values: list) -> str:
+    """
+    Infer the type of a column from its values in the first batch.
+    The parsers output timestamps as "YYYY-MM-DD HH:MM:SS" strings, those become native timestamp columns again.
+    """
+    values = [value for value in values if value is not None]
+    if not values:
+        return "string"
+    if all(isinstance(value, str) and TIMESTAMP.match(value) for value in values):
+        return "timestamp"
+    if all(isinstance(value, bool) for value in values):
+        return "bool"
+    if all(isinstance(value, int) and not isinstance(value, bool) for value in values):
+        return "int"
+    if all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in values):
+        return "float"
+    if all(isinstance(value, bytes) for value in values):
+        return "binary"
+    return "string"
+
+
+def to_timestamp(value):
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):  # "Invalid timestamp" and the like, or read back from a file that is rewritten
+        return value if isinstance(value, datetime) else None
+
+
+INT64 = 2**63
+
+# How every kind of column is stored, and how a value is converted to it. Values that don't fit become None, and make
+# the column wider (see convert_column)
+KINDS = {
+    "timestamp": (lambda: pyarrow.timestamp("us"), to_timestamp),
+    "bool": (lambda: pyarrow.bool_(), lambda value: value if isinstance(value, bool) else None),
+    "int": (lambda: pyarrow.int64(), lambda value: value if type(value) is int and -INT64 <= value < INT64 else None),
+    "float": (lambda: pyarrow.float64(), lambda value: float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else None),
+    "binary": (lambda: pyarrow.binary(), lambda value: value if isinstance(value, bytes) else None),
+    "string": (lambda: pyarrow.string(), lambda value: None if value is None else str(value)),
+}
+
+
+def wider_kind(kind: str, other: str) -> str:
+    """The narrowest kind that holds the values of both kinds: int and float make float, any other pair string."""
+    if kind == other:
+        return kind
+    return "float" if {kind, other} == {"int", "float"} else "string"
+
+
+def convert_column(kind: str, batch: list, index: int):
+    """
+    Convert column index of the rows in batch to kind, and return (kind, converted values).
+    The kind is inferred from the first batch, a later value that doesn't fit it widens it instead of being lost:
+    an int column becomes a float column for a float, and any column becomes a string column otherwise, which every
+    value fits, the same text as in the CSV output.
+    """
+    convert = KINDS[kind][1]
+    converted = [convert(entry[index]) for entry in batch]
+    # Only a value that doesn't fit converts to None, besides None itself
+    while None in converted and converted.count(None) != sum(entry[index] is None for entry in batch):
+        misfits = [entry[index] for entry, value in zip(batch, converted) if value is None and entry[index] is not None]
+        widened = wider_kind(kind, column_kind(misfits))
+        kind = widened if widened != kind else "string"  # A too large int, or a date that doesn't exist
+        convert = KINDS[kind][1]
+        converted = [convert(entry[index]) for entry in batch]
+    return kind, converted
+
+
+class ArrowConverter:
+    """
+    Turns row batches of an artifact into Arrow record batches.
+    The schema is inferred from the first batch, so it is known before the first row group is written. A later batch
+    with a value that doesn't fit its column widens the column (see convert_column), which changes the schema, the
+    record batches converted before have to be converted again (see reset).
+    Dictionary columns keep a single dictionary that only grows, every batch refers to it and adds its new values to
+    the end, so an Arrow IPC file only has to store the new values of every batch (a dictionary delta).
+    """
+
+    def __init__(self, headers: list, first_batch: list):
+        self.headers = headers
+        self.kinds = [column_kind([entry[index] for entry in first_batch]) for index in range(len(headers))]
+        self.schema = None
+        self.reset()
+
+    def reset(self):
+        """Build the schema from the current kinds, and start with empty dictionaries."""
+        fields = []
+        for header, kind in zip(self.headers, self.kinds):
+            data_type = KINDS[kind][0]()
+            if kind == "string" and header in DICTIONARY_COLUMNS:
+                data_type = pyarrow.dictionary(pyarrow.int32(), data_type)
+            fields.append(pyarrow.field(header, data_type))
+        self.schema = pyarrow.schema(fields)
+        # {value: index} and the Arrow array of the values of every dictionary column
+        self.dictionaries = {index: ({}, pyarrow.array([], type=pyarrow.string())) for index, field in enumerate(self.schema) if pyarrow.types.is_dictionary(field.type)}
+
+    def convert(self, batch: list):
+        kinds = list(self.kinds)
+        converted = []
+        for index, kind in enumerate(kinds):
+            self.kinds[index], values = convert_column(kind, batch, index)
+            converted.append(values)
+        if self.kinds != kinds:
+            self.reset()
+        columns = []
+        for index, (field, values) in enumerate(zip(self.schema, converted)):
+            if index in self.dictionaries:
+                columns.append(self.encode(index, values))
+            else:
+                columns.append(pyarrow.array(values, type=field.type))
+        return pyarrow.RecordBatch.from_arrays(columns, schema=self.schema)
+
+    def encode(self, index: int, values: list):
+        """A dictionary array of values, only the values that are new to the dictionary are added to its Arrow array."""
+        positions, dictionary = self.dictionaries[index]
+        known = len(positions)
+        indices = [None if value is None else positions.setdefault(value, len(positions)) for value in values]
+        if len(positions) > known:
+            added = dict.fromkeys(value for value, position in zip(values, indices) if position is not None and position >= known)
+            dictionary = pyarrow.concat_arrays([dictionary, pyarrow.array(list(added), type=pyarrow.string())])
+            self.dictionaries[index] = (positions, dictionary)
+        return pyarrow.DictionaryArray.from_arrays(pyarrow.array(indices, type=pyarrow.int32()), dictionary)
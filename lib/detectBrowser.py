@@ -1,5 +1,8 @@
+import json
 import os
+import re
 import string
+from lib.chromium import BROWSERS  # type: ignore
 
 def find_single_letter_directory(path):
     """
@@ -37,6 +40,28 @@ def determine_browser(path):
             return "unknown"
 
 
+def find_chromium_profiles(user_data, default="Default"):
+    """
+    Find every profile in a Chromium "User Data" directory.
+    Profiles are listed in the info_cache of "Local State", and the directory listing is used as well, to catch
+    profiles that were deleted from Local State but are still on disk (and collections where Local State is missing).
+    """
+    names = set()
+    try:
+        with open(f"{user_data}/Local State", "r", encoding="UTF-8") as file:
+            names.update(json.load(file).get("profile", {}).get("info_cache", {}).keys())
+    except (OSError, ValueError, AttributeError):
+        pass
+    for directory in os.listdir(user_data):
+        if directory in (default, "Guest Profile") or re.fullmatch(r"Profile \d+", directory):
+            names.add(directory)
+
+    profiles = [name for name in names if os.path.isdir(f"{user_data}/{name}")]
+    # Default first, then Profile 1, Profile 2, ..., Profile 10 in numerical order
+    profiles.sort(key=lambda name: (name != default, int(re.sub(r"\D", "", name) or 0), name))
+    return tuple(f"{user_data}/{name}" for name in profiles)
+
+
 def locate_browser_directories(path):
     
     # Check for a single letter directory first, and use that as the "starting point"
@@ -57,13 +82,11 @@ def locate_browser_directories(path):
                 directories.append(f"{appdata}/Roaming/Mozilla/Firefox/Profiles/{profile}")
 
             return_val["Firefox"] = tuple(directories)
-        if os.path.exists(f"{appdata}/Local/Google/Chrome/User Data/Default"):
-            return_val["Chrome"] = f"{appdata}/Local/Google/Chrome/User Data/Default"
-        if os.path.exists(f"{appdata}/Local/Microsoft/Edge/User Data/Default"):
-            return_val["Edge"] = f"{appdata}/Local/Microsoft/Edge/User Data/Default"
-
-        if os.path.exists(f"{appdata}/Roaming/Opera Software/Opera Stable/Default"):
-            return_val["Opera"] = f"{appdata}/Roaming/Opera Software/Opera Stable/Default"
+        for browser in BROWSERS:
+            if os.path.exists(f"{appdata}/{browser.user_data}"):
+                profiles = find_chromium_profiles(f"{appdata}/{browser.user_data}", browser.profile)
+                if profiles:
+                    return_val[browser.title] = profiles
 
         user_dir[username] = return_val
     return user_dir
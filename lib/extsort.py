@@ -0,0 +1,50 @@
+import heapq
+import os
+import pickle
+import tempfile
+
+# Records held in memory before they are sorted and spilled to disk as a run
+RUN_ROWS = 100_000
+
+
+class ExternalSort:
+    """
+    Sorts records without holding them all in memory.
+    Records are collected in runs of RUN_ROWS, every run is sorted and pickled to its own file in directory, and
+    iterating merges the runs back together with heapq.merge, reading a single record of every run at a time.
+    """
+
+    def __init__(self, directory: str, key=None):
+        self.directory = directory
+        self.key = key
+        self.buffer = []
+        self.runs = []
+
+    def add(self, records):
+        for record in records:
+            self.buffer.append(record)
+            if len(self.buffer) >= RUN_ROWS:
+                self.spill()
+
+    def spill(self):
+        self.buffer.sort(key=self.key)
+        file, path = tempfile.mkstemp(dir=self.directory, suffix=".run")
+        with os.fdopen(file, "wb") as run_file:
+            for record in self.buffer:
+                pickle.dump(record, run_file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.runs.append(path)
+        self.buffer = []
+
+    @staticmethod
+    def read(path: str):
+        with open(path, "rb") as run_file:
+            while True:
+                try:
+                    yield pickle.load(run_file)
+                except EOFError:
+                    return
+
+    def __iter__(self):
+        if self.buffer:
+            self.spill()
+        return heapq.merge(*(self.read(path) for path in self.runs), key=self.key)
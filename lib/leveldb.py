@@ -0,0 +1,294 @@
+import heapq
+import itertools
+import mmap
+import os
+import re
+from dataclasses import dataclass
+from lib.wire import read_varint  # type: ignore
+
+try:
+    import snappy
+except ImportError:  # Optional, python-snappy decompresses the table blocks faster than the Python version below
+    snappy = None
+
+# Table (.ldb, .sst in older versions) and write-ahead log files of a LevelDB directory. The MANIFEST has the log
+# format as well, but holds version edits instead of records, and LOG / LOG.old are plain text
+TABLE_FILE = re.compile(r"^\d+\.(ldb|sst)$")
+LOG_FILE = re.compile(r"^\d+\.log$")
+
+TABLE_MAGIC = 0xDB4775248B80FB57
+FOOTER_SIZE = 48
+BLOCK_TRAILER_SIZE = 5  # Compression type and CRC
+NO_COMPRESSION = 0
+SNAPPY_COMPRESSION = 1
+
+LOG_BLOCK_SIZE = 32768
+LOG_HEADER_SIZE = 7  # CRC, length and type
+FULL, FIRST, MIDDLE, LAST = 1, 2, 3, 4
+
+TYPE_DELETION = 0
+TYPE_VALUE = 1
+
+
+@dataclass
+class Record:
+    """A single key/value record of a table or log file, deletion markers have an empty value."""
+
+    key: bytes
+    value: bytes
+    sequence: int
+    deleted: bool
+    source: str
+
+
+def snappy_decompress(data) -> bytes:
+    """Decompress a raw Snappy block (no framing), as LevelDB compresses its table blocks."""
+    if snappy is not None:
+        try:
+            return snappy.decompress(data)
+        except Exception as e:  # Damaged blocks are a ValueError, like in the Python version
+            raise ValueError(f"Invalid Snappy block: {e}") from e
+    length, position = read_varint(data, 0)
+    output = bytearray()
+    end = len(data)
+    from_bytes = int.from_bytes
+    while position < end:
+        tag = data[position]
+        kind = tag & 3
+        if kind == 0:  # Literal, its length is in the tag or in the 1-4 bytes after it
+            size = (tag >> 2) + 1
+            position += 1
+            if size > 60:
+                extra = size - 60
+                size = from_bytes(data[position:position + extra], "little") + 1
+                position += extra
+            output += data[position:position + size]
+            position += size
+            continue
+        if kind == 1:
+            size = ((tag >> 2) & 7) + 4
+            offset = ((tag >> 5) << 8) | data[position + 1]
+            position += 2
+        elif kind == 2:
+            size = (tag >> 2) + 1
+            offset = from_bytes(data[position + 1:position + 3], "little")
+            position += 3
+        else:
+            size = (tag >> 2) + 1
+            offset = from_bytes(data[position + 1:position + 5], "little")
+            position += 5
+        written = len(output)
+        if not 0 < offset <= written:
+            raise ValueError("Invalid Snappy copy offset")
+        start = written - offset
+        if offset >= size:
+            output += output[start:start + size]
+        else:  # The copy overlaps what it produces, a repeating pattern
+            output += (output[start:] * (size // offset + 1))[:size]
+    if len(output) != length:
+        raise ValueError("Snappy block has the wrong length")
+    return bytes(output)
+
+
+def block_entries(block):
+    """The (key, value) entries of a table block, keys are stored as a shared prefix with the previous key."""
+    restarts = int.from_bytes(block[-4:], "little")
+    end = len(block) - 4 - 4 * restarts
+    position = 0
+    key = b""
+    while position < end:
+        shared, position = read_varint(block, position)
+        unshared, position = read_varint(block, position)
+        value_size, position = read_varint(block, position)
+        key = key[:shared] + bytes(block[position:position + unshared])
+        position += unshared
+        yield key, block[position:position + value_size]
+        position += value_size
+
+
+def read_block(data, handle):
+    """The contents of the block at handle, an (offset, size) pair, decompressed."""
+    offset, size = handle
+    compression = data[offset + size]
+    block = data[offset:offset + size]
+    if compression == SNAPPY_COMPRESSION:
+        return snappy_decompress(block)
+    if compression != NO_COMPRESSION:
+        raise ValueError(f"Unsupported block compression {compression}")
+    return block
+
+
+def read_handle(data, position: int = 0):
+    offset, position = read_varint(data, position)
+    size, position = read_varint(data, position)
+    return (offset, size), position
+
+
+def internal_record(key: bytes, value, source: str) -> Record:
+    """Split a table key into the user key, and the sequence number and type in its last 8 bytes."""
+    tag = int.from_bytes(key[-8:], "little")
+    deleted = tag & 0xFF == TYPE_DELETION
+    return Record(key[:-8], b"" if deleted else value, tag >> 8, deleted, source)
+
+
+def internal_order(record: Record):
+    """The order of the records in a table: by key, and the newest (highest sequence number) first."""
+    return record.key, -record.sequence
+
+
+def read_table(path: str):
+    """
+    Yield every record of a table file (.ldb), in key order.
+    Only the blocks that are read are paged in from a memory map of the file, the file is never read as a whole.
+    """
+    source = os.path.basename(path)
+    with open(path, "rb") as file:
+        if os.fstat(file.fileno()).st_size < FOOTER_SIZE:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            footer = data[-FOOTER_SIZE:]
+            if int.from_bytes(footer[-8:], "little") != TABLE_MAGIC:
+                raise ValueError(f"{source} is not a LevelDB table")
+            _, position = read_handle(footer)  # The metaindex block, only used for filters
+            index_handle, _ = read_handle(footer, position)
+            for _, handle in block_entries(read_block(data, index_handle)):
+                for key, value in block_entries(read_block(data, read_handle(handle)[0])):
+                    yield internal_record(key, value, source)
+
+
+def log_records(data):
+    """The records of a log file in order, reassembled from the fragments they are split in at block boundaries."""
+    position = 0
+    fragments = []
+    while position + LOG_HEADER_SIZE <= len(data):
+        block_left = LOG_BLOCK_SIZE - position % LOG_BLOCK_SIZE
+        if block_left < LOG_HEADER_SIZE:  # The rest of the block is padding
+            position += block_left
+            continue
+        length = int.from_bytes(data[position + 4:position + 6], "little")
+        kind = data[position + 6]
+        payload = data[position + LOG_HEADER_SIZE:position + LOG_HEADER_SIZE + length]
+        position += LOG_HEADER_SIZE + length
+        if kind == FULL:
+            fragments = []
+            yield bytes(payload)
+        elif kind == FIRST:
+            fragments = [payload]
+        elif kind == MIDDLE and fragments:
+            fragments.append(payload)
+        elif kind == LAST and fragments:
+            fragments.append(payload)
+            yield b"".join(fragments)
+            fragments = []
+        elif kind == 0 and length == 0:  # Preallocated space that was never written to
+            position += block_left - LOG_HEADER_SIZE
+            fragments = []
+
+
+def batch_records(batch: bytes, source: str):
+    """Yield the records of a write batch: a sequence number and a count, then a tagged key (and value) per record."""
+    sequence = int.from_bytes(batch[:8], "little")
+    count = int.from_bytes(batch[8:12], "little")
+    position = 12
+    for index in range(count):
+        kind = batch[position]
+        size, position = read_varint(batch, position + 1)
+        key = batch[position:position + size]
+        position += size
+        if kind == TYPE_VALUE:
+            size, position = read_varint(batch, position)
+            yield Record(key, batch[position:position + size], sequence + index, False, source)
+            position += size
+        elif kind == TYPE_DELETION:
+            yield Record(key, b"", sequence + index, True, source)
+        else:
+            raise ValueError(f"Unknown record type {kind} in {source}")
+
+
+def read_log(path: str):
+    """Yield every record of a write-ahead log file (.log) in the order they were written, the newest last."""
+    source = os.path.basename(path)
+    with open(path, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for batch in log_records(data):
+                try:
+                    yield from batch_records(batch, source)
+                except (IndexError, ValueError) as e:  # A batch that was cut off by a crash or is damaged
+                    print(f"[!] LevelDB read error: {e}")
+
+
+class LevelDB:
+    """
+    Read-only access to a LevelDB directory, without libleveldb.
+    The table and log files are read directly, so nothing is written to the evidence, the LOCK file is ignored, and
+    records that were not compacted yet are read from the logs. Records that were deleted or overwritten, but not
+    compacted away, can be recovered as well (see recovered).
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def read(self, name: str, records, prefix: bytes):
+        """The records of a single file with a key starting with prefix, up to the first error in it."""
+        try:
+            for record in records:
+                if record.key.startswith(prefix):
+                    yield record
+        except (IndexError, ValueError) as e:  # Keep what could be read, and go on with the next file
+            print(f"[!] LevelDB read error in {name}: {e}")
+
+    def records(self, prefix: bytes = b""):
+        """
+        Every record of every table and log file with a key starting with prefix, in key order and the newest first.
+        The tables are already in that order and are merged lazily. The logs are in write order, and are sorted in
+        memory, they are never larger than the write buffer (a few MiB) before they are compacted into a table.
+        """
+        sources = []
+        for name in sorted(os.listdir(self.directory)):
+            path = os.path.join(self.directory, name)
+            if TABLE_FILE.match(name):
+                sources.append(self.read(name, read_table(path), prefix))
+            elif LOG_FILE.match(name):
+                sources.append(sorted(self.read(name, read_log(path), prefix), key=internal_order))
+        return heapq.merge(*sources, key=internal_order)
+
+    def entries(self, prefix: bytes = b""):
+        """
+        Every record with a value, in key order, as ("live", record) for the value the key has now and ("deleted",
+        record) or ("overwritten", record) for the older values that are still in the files, because the key was
+        deleted or written again later and they weren't compacted away yet. The older values of a key follow its
+        live value, oldest first. This is a single pass over the files, that holds a single key at a time.
+        """
+        records = self.records(prefix)
+        for _, group in itertools.groupby(records, key=lambda record: record.key):
+            newest = next(group)
+            if not newest.deleted:
+                yield "live", newest
+            state = "deleted" if newest.deleted else "overwritten"
+            older = []
+            sequence = newest.sequence
+            for record in group:
+                if record.sequence == sequence:  # A log that was compacted into a table, but not removed yet
+                    continue
+                sequence = record.sequence
+                if not record.deleted:
+                    older.append(record)
+            for record in reversed(older):
+                yield state, record
+
+    def iterator(self, prefix: bytes = b""):
+        """The (key, value) of every key that exists, in key order, the same as the database itself would return."""
+        for state, record in self.entries(prefix):
+            if state == "live":
+                yield record.key, record.value
+
+    def recovered(self, prefix: bytes = b""):
+        """
+        The records with a value that is no longer the value of their key, because the key was deleted ("deleted")
+        or written again ("overwritten") later, in key and sequence order.
+        """
+        for state, record in self.entries(prefix):
+            if state != "live":
+                yield state, record
@@ -0,0 +1,153 @@
+import datetime
+import glob
+import hashlib
+import json
+import os
+from lib.output import ADDING_FORMATS, output_start  # type: ignore
+
+MANIFEST_NAME = "manifest.jsonl"
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 of a file, read in 1 MiB chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while chunk := file.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_inputs(directory: str, inputs: tuple, digests: bool = True) -> dict:
+    """
+    Identify every input of a profile that exists, keyed by its path relative to the profile directory, by its size
+    and modification time, and with digests by its SHA-256 as well.
+    Inputs can be glob patterns, and directories (LevelDB) have every file in them hashed separately.
+    Hashing reads the evidence a second time, which is slow on network storage, so it is only done when the hashes
+    are used: to resume a run (see Checkpoint), or as the key of the cache.
+    """
+    paths = []
+    for name in inputs:
+        for path in sorted(glob.glob(os.path.join(glob.escape(directory), name))):
+            if os.path.isdir(path):
+                paths.extend(os.path.join(root, filename) for root, _, files in sorted(os.walk(path)) for filename in sorted(files))
+            else:
+                paths.append(path)
+    return {os.path.relpath(path, directory): fingerprint(path, digests) for path in paths}
+
+
+def fingerprint(path: str, digest: bool) -> dict:
+    stat = os.stat(path)
+    entry = {"size": stat.st_size, "mtime": stat.st_mtime_ns}
+    if digest:
+        entry["sha256"] = file_digest(path)
+    return entry
+
+
+def same_inputs(recorded: dict, inputs: dict) -> bool:
+    """
+    Whether inputs are the inputs of a record: the same files with the same SHA-256 when both were hashed, the same
+    size and modification time when the record is from a run that didn't hash them.
+    """
+    if not isinstance(recorded, dict) or recorded.keys() != inputs.keys():
+        return False
+    for name, entry in inputs.items():
+        old = recorded[name]
+        if not isinstance(old, dict):  # A manifest of an older version
+            return False
+        if "sha256" in old and "sha256" in entry:
+            if old["sha256"] != entry["sha256"]:
+                return False
+        elif (old["size"], old["mtime"]) != (entry["size"], entry["mtime"]):
+            return False
+    return True
+
+
+def load_manifest(output: str) -> dict:
+    """
+    Read the manifest of an earlier run, and group the records by (user, browser, directory).
+    A line cut off by a crash is ignored, the artifact it belonged to is simply parsed again.
+    """
+    records = {}
+    try:
+        with open(os.path.join(output, MANIFEST_NAME), "r", encoding="UTF-8") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                records.setdefault((record["user"], record["browser"], record["directory"]), []).append(record)
+    except FileNotFoundError:
+        pass
+    return records
+
+
+def prepare_manifest(output: str, resume: bool):
+    """
+    Start a new manifest, so a fresh run never skips anything because of an older one.
+    When resuming, terminate the line a crash may have cut off instead, so it doesn't swallow the next record.
+    """
+    path = os.path.join(output, MANIFEST_NAME)
+    if not resume:
+        open(path, "w", encoding="UTF-8").close()
+        return
+    with open(path, "ab+") as file:
+        file.seek(0, os.SEEK_END)
+        if file.tell():
+            file.seek(-1, os.SEEK_END)
+            if file.read(1) != b"\n":
+                file.write(b"\n")
+
+
+class Checkpoint:
+    """
+    Records the artifacts of a single (user, browser, profile) unit in the manifest of the output directory,
+    as soon as each of them is written, together with the hashes of the inputs and the paths of the outputs.
+    Every record is a single appended line, so worker processes can share the manifest and a crash loses at most
+    the artifact that was being written.
+
+    With resume, artifacts that an earlier run finished from the same inputs are skipped, and the partial output of
+    the artifact that was interrupted is removed before it is written again.
+    """
+
+    def __init__(self, output: str, user: str, browser: str, directory: str, profile: str, inputs: dict, records: list = (), resume: bool = False):
+        self.path = os.path.join(output, MANIFEST_NAME)
+        self.key = {"user": user, "browser": browser, "directory": directory, "profile": profile}
+        self.inputs = inputs
+        self.resume = resume
+        # The outputs of the artifacts written by this run
+        self.written = {}
+        # Where the rows of this run start in the outputs that are added to, {path: start} (see output_start)
+        self.starts = {}
+        # Only records made from the same inputs count, a changed database means the artifact has to be parsed again
+        self.finished = {record["artifact"]: record for record in records if same_inputs(record["inputs"], inputs)}
+
+    def is_complete(self) -> bool:
+        """Whether every artifact of the unit was finished by an earlier run."""
+        return self.resume and None in self.finished and all(self.is_finished(artifact) for artifact in self.finished if artifact)
+
+    def is_finished(self, artifact: str) -> bool:
+        record = self.finished.get(artifact)
+        return self.resume and record is not None and all(os.path.exists(path) for path in record["outputs"])
+
+    def start(self, artifact: str, outputs: list):
+        """
+        Remove what an interrupted run left of the outputs, before the artifact is written again.
+        The JSON and JSON Lines outputs add to the output of earlier runs, remember where the rows of this run start.
+        """
+        for path in outputs:
+            if self.resume and os.path.exists(path):
+                os.remove(path)
+            extension = path.rsplit(f"_{artifact}.", 1)[1]
+            if extension in ADDING_FORMATS:
+                self.starts[path] = output_start(path, extension)
+
+    def record(self, artifact, outputs: list = ()):
+        """Append a record for a finished artifact. An artifact of None marks the whole unit as finished."""
+        if artifact:
+            self.written[artifact] = list(outputs)
+        record = {**self.key, "artifact": artifact, "inputs": self.inputs, "outputs": list(outputs), "finished": datetime.datetime.now(datetime.timezone.utc).isoformat()}
+        with open(self.path, "a", encoding="UTF-8") as file:
+            file.write(json.dumps(record) + "\n")
+
+    def complete(self):
+        self.record(None)
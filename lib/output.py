@@ -2,15 +2,41 @@ import csv
 import json
 from tabulate import tabulate
 import datetime
+import functools
+import os
+import shutil
+from lib.columnar import ArrowConverter, pyarrow  # type: ignore
+from lib.report import Aggregates  # type: ignore
+
+# The output formats, named after their command line flag and file extension
+FORMATS = ("csv", "json", "jsonl", "html", "parquet", "arrow")
+
+# Formats that add the rows to the output of an earlier run into the same directory, instead of replacing it
+ADDING_FORMATS = ("json", "jsonl")
+
+# Tables with more rows than this get a virtual HTML report instead of a plain HTML table (see html_sink)
+VIRTUAL_ROWS = 10_000
+
+
+@functools.lru_cache(maxsize=None)
+def load_template(name: str) -> str:
+    """Read an HTML template of lib/ once per process, wherever the parser is run from."""
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), name), "r", encoding="utf-8") as template:
+        return template.read()
 
 
 class outputWriter:
     """
-    This class is made to write the output of parse_ functions to either CSV or JSON (Json is W.I.P)
-    the write_csv function takes a list like this [["column","column2"],["row1_col1","row1_col2"]] and writes it to a csv like this
+    This class is made to write the output of parse_ functions to CSV, JSON, JSON Lines, HTML, Parquet and/or Arrow
+    write takes the headers, and an iterable of row batches like this [[["row1_col1","row1_col2"]], [["row2_col1","row2_col2"]]]
+    and writes it to a csv like this
     column1,column2
     row1_col1,row1_col2
+    row2_col1,row2_col2
 
+    The batches are written as they come in, so the parse_ functions never have to hold a whole table in memory.
+    Every format has a _sink generator that is sent the batches one at a time, so a single pass over the batches
+    feeds every requested format. The sinks only read the batches, they share them without copying.
     This is to reduce code reuse in the parsing functions
     """
 
@@ -24,43 +50,93 @@ class outputWriter:
         else:
             self.filename = f"{self.output_directory}{self.user}_{self.browser}"
 
-    def write_csv(self, datatype: str, content: list):
-        with open(f"{self.filename}_{datatype}.csv", "w+", newline="", encoding="UTF-8") as csvfile:
+    def path(self, datatype: str, extension: str) -> str:
+        return f"{self.filename}_{datatype}.{extension}"
+
+    def outputs(self, datatype: str, formats) -> list:
+        """The files write writes for datatype, the HTML output comes with the summary of the artifact for the index."""
+        outputs = [self.path(datatype, extension) for extension in formats]
+        if "html" in formats:
+            outputs.append(self.path(datatype, "summary.json"))
+        return outputs
+
+    def write(self, datatype: str, headers: list, batches, formats):
+        """Write the batches to every format in formats (see FORMATS) at once, in a single pass over the batches."""
+        sinks = [getattr(self, f"{extension}_sink")(datatype, headers) for extension in formats]
+        try:
+            for sink in sinks:
+                next(sink)  # Open the file and write what comes before the rows
+            for batch in batches:
+                for sink in sinks:
+                    sink.send(batch)
+            for sink in sinks:
+                try:
+                    sink.send(None)  # No more rows, write what comes after them
+                except StopIteration:
+                    pass
+        finally:
+            for sink in sinks:
+                sink.close()
+
+    def csv_sink(self, datatype: str, headers: list):
+        with open(self.path(datatype, "csv"), "w+", newline="", encoding="UTF-8") as csvfile:
             csv_writer = csv.writer(csvfile)
-            for line in content:
-                csv_writer.writerow(line)
+            csv_writer.writerow(headers)
+            while (batch := (yield)) is not None:
+                csv_writer.writerows(batch)
 
-    def write_json(self, datatype: str, content: list):
-        headers = content.pop(0)  # Remove the first element to remove the headers
+    def json_sink(self, datatype: str, headers: list):
         try:
-            with open(f"{self.filename}_{datatype}.json", "r") as file:
+            with open(self.path(datatype, "json"), "r") as file:
                 existing_json = json.load(file)
         except FileNotFoundError:
             existing_json = []
 
-        new_json = []
-        # Loop through the entries and add them to new JSON
-        for entry in content:
-            json_data = {}
-            for header, value in zip(headers, entry):
-                json_data[header] = value
-            new_json.append(json_data)
+        # Write the JSON one entry at a time, laid out the same way as json.dump(entries, file, indent=4)
+        with open(self.path(datatype, "json"), "w", encoding="UTF-8") as file:
+            separator = "[\n    "
+            entries = existing_json
+            while True:
+                for entry in entries:
+                    file.write(separator)
+                    file.write(json.dumps(entry, indent=4).replace("\n", "\n    "))
+                    separator = ",\n    "
+                if (batch := (yield)) is None:
+                    break
+                # Loop through the entries and add them to new JSON
+                entries = (dict(zip(headers, entry)) for entry in batch)
+            file.write("[]" if separator == "[\n    " else "\n]")
 
-        existing_json.extend(new_json)
+    def jsonl_sink(self, datatype: str, headers: list):
+        """
+        Append one JSON object per line to <datatype>.jsonl.
+        Unlike the JSON output, earlier output is never read back, so this stays linear no matter how often it is
+        written to, and the file can be tailed by an ingestion pipeline while the parser is running.
+        """
+        with open(self.path(datatype, "jsonl"), "a", encoding="UTF-8", buffering=1024 * 1024) as file:
+            while (batch := (yield)) is not None:
+                file.writelines(json.dumps(dict(zip(headers, entry))) + "\n" for entry in batch)
 
-        # Write updated JSON to file:
-        with open(f"{self.filename}_{datatype}.json", "w", encoding="UTF-8") as file:
-            json.dump(existing_json, file, indent=4)
+    def html_sink(self, datatype: str, headers: list):
+        # The summary of the artifact for the index page of the case (see lib/report.py), counted as the rows come in
+        aggregates = Aggregates(headers)
+        # tabulate needs the whole table at once to lay out the columns, which is fine up to VIRTUAL_ROWS rows
+        content = []
+        while (batch := (yield)) is not None:
+            aggregates.add(batch)
+            content.extend(batch)
+            if len(content) > VIRTUAL_ROWS:
+                yield from self.virtual_html_sink(datatype, headers, content, aggregates)
+                break
+        else:
+            self.write_html(datatype, headers, content)
+        aggregates.write(self.path(datatype, "summary.json"), datatype)
 
-    def write_html(self, datatype: str, content: list):
-        # content[0] are the headers
-        headers = content.pop(0)
+    def write_html(self, datatype: str, headers: list, content: list):
         # Use tabulate to generate the HTML for the table body
         table_html = tabulate(content, headers, tablefmt="html")
 
-        # Load the HTML template from the file
-        with open("lib/template.html", "r", encoding="utf-8") as template:
-            html_template = template.read()
+        html_template = load_template("template.html")
         iso_time = datetime.datetime.now(datetime.timezone.utc).isoformat()
         # Insert the generated table into the template
         html_template = html_template.replace("{{ artifact }}", datatype)
@@ -68,8 +144,141 @@ class outputWriter:
         html_template = html_template.replace("{{ browser }}", self.browser)
         html_template = html_template.replace("{{ date }}", iso_time)
         final_html = html_template.replace("{{ table }}", table_html)
-        
-        with open(f"{self.filename}_{datatype}.html", "w", encoding="UTF-8") as file:
+
+        with open(self.path(datatype, "html"), "w", encoding="UTF-8") as file:
             file.write(final_html)
 
+    def virtual_html_sink(self, datatype: str, headers: list, content: list, aggregates: Aggregates):
+        """
+        Write a report that scales to millions of rows: the rows are embedded as chunks of compact JSON arrays, a
+        chunk per batch so they are written while the batches stream in, and the page only puts the rows in view
+        in the DOM. Sorting and filtering work on the columns in memory instead of on table rows.
+        content is the rows that came in before it was clear the table was too large for a plain HTML table.
+        """
+        html_template = load_template("template_virtual.html")
+        iso_time = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        html_template = html_template.replace("{{ artifact }}", datatype)
+        html_template = html_template.replace("{{ user }}", self.user)
+        html_template = html_template.replace("{{ browser }}", self.browser)
+        html_template = html_template.replace("{{ date }}", iso_time)
+        html_template = html_template.replace("{{ headers }}", script_json(headers))
+        before, after = html_template.split("{{ data }}")
+
+        with open(self.path(datatype, "html"), "w", encoding="UTF-8") as file:
+            file.write(before)
+            batch = content
+            while batch is not None:
+                file.write(f'<script class="chunk" type="application/json">{script_json(batch)}</script>\n')
+                batch = yield
+                if batch is not None:
+                    aggregates.add(batch)
+            file.write(after)
+
+    def parquet_sink(self, datatype: str, headers: list):
+        """
+        Write a Parquet file with a row group per batch, so it is flushed while the batches stream in.
+        Timestamps are native timestamp columns, and hosts, MIME types, visit types, ... are dictionary encoded.
+        """
+        def open_writer(path, schema):
+            return pyarrow.parquet.ParquetWriter(path, schema, compression="zstd")
+
+        def read_batches(path):
+            with pyarrow.parquet.ParquetFile(path) as file:
+                yield from file.iter_batches()
+
+        return self.columnar_sink(self.path(datatype, "parquet"), headers, open_writer, read_batches)
+
+    def arrow_sink(self, datatype: str, headers: list):
+        """Write an Arrow IPC file, with the same schema as the Parquet output, that can be memory mapped as is."""
+        def open_writer(path, schema):
+            return pyarrow.ipc.new_file(path, schema, options=pyarrow.ipc.IpcWriteOptions(emit_dictionary_deltas=True))
+
+        def read_batches(path):
+            with pyarrow.ipc.open_file(path) as file:
+                for index in range(file.num_record_batches):
+                    yield file.get_batch(index)
+
+        return self.columnar_sink(self.path(datatype, "arrow"), headers, open_writer, read_batches)
+
+    def columnar_sink(self, path: str, headers: list, open_writer, read_batches):
+        """
+        The sink of parquet_sink and arrow_sink, a record batch per batch, written with open_writer(path, schema).
+        When a batch widens a column (see lib/columnar.py), what was written so far is read back with read_batches,
+        and written again with the wider schema. A column is widened twice at most, so this is rare and bounded.
+        """
+        batch = yield
+        converter = ArrowConverter(headers, batch or [])
+        writer = None
+        try:
+            while batch is not None:
+                record = converter.convert(batch)
+                if writer is None:
+                    writer = open_writer(path, converter.schema)
+                elif not record.schema.equals(writer_schema):
+                    writer.close()
+                    writer = None
+                    os.replace(path, f"{path}.narrow")
+                    converter.reset()
+                    writer = open_writer(path, converter.schema)
+                    for narrow in read_batches(f"{path}.narrow"):
+                        writer.write_batch(converter.convert(list(zip(*(column.to_pylist() for column in narrow.columns)))))
+                    os.remove(f"{path}.narrow")
+                    record = converter.convert(batch)
+                writer_schema = converter.schema
+                writer.write_batch(record)
+                batch = yield
+            if writer is None:  # No rows, only the schema
+                writer = open_writer(path, converter.schema)
+        finally:
+            if writer is not None:
+                writer.close()
+
+
+def output_start(path: str, extension: str) -> int:
+    """
+    Where the rows of this run will start in an output of ADDING_FORMATS: the size of the JSON Lines file, the number
+    of entries of the JSON file. 0 when there is no earlier output.
+    """
+    if not os.path.exists(path):
+        return 0
+    if extension == "jsonl":
+        return os.path.getsize(path)
+    with open(path, "r", encoding="UTF-8") as file:
+        return len(json.load(file))
+
+
+def copy_added(path: str, extension: str, start: int, destination: str):
+    """
+    Copy the rows that were added to an output of ADDING_FORMATS since start (see output_start) to destination, as
+    the file a run into an empty directory would have written.
+    """
+    if extension == "jsonl":
+        with open(path, "rb") as source, open(destination, "wb") as target:
+            source.seek(start)
+            shutil.copyfileobj(source, target)
+        return
+    with open(path, "r", encoding="UTF-8") as file:
+        entries = json.load(file)[start:]
+    with open(destination, "w", encoding="UTF-8") as file:
+        json.dump(entries, file, indent=4)  # The layout of json_sink
+
+
+def add_output(source: str, path: str, extension: str):
+    """Add the rows of source to the output at path, the way jsonl_sink and json_sink add to the output of an earlier run."""
+    if extension == "jsonl":
+        with open(source, "rb") as rows, open(path, "ab") as file:
+            shutil.copyfileobj(rows, file)
+        return
+    entries = []
+    if os.path.exists(path):
+        with open(path, "r", encoding="UTF-8") as file:
+            entries = json.load(file)
+    with open(source, "r", encoding="UTF-8") as rows:
+        entries.extend(json.load(rows))
+    with open(path, "w", encoding="UTF-8") as file:
+        json.dump(entries, file, indent=4)
+
 
+def script_json(value) -> str:
+    """Compact JSON that can be embedded in a <script> element as is, "<" only appears in strings and is escaped."""
+    return json.dumps(value, separators=(",", ":"), default=str).replace("<", "\\u003c")
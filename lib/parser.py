@@ -0,0 +1,122 @@
+import sqlite3
+from lib.casedb import Shard  # type: ignore
+from lib.database import ConnectionCache, PARTITION_THRESHOLD, estimate_rows, fetch_batches, partitioned_batches, rowid_partitions  # type: ignore
+from lib.output import FORMATS, outputWriter  # type: ignore
+from lib.schema import select_columns  # type: ignore
+from lib.search import SearchShard  # type: ignore
+from lib.timeline import Timeline  # type: ignore
+
+
+class BrowserParser:
+    """
+    Base class for the browser parsers.
+    Every instance holds its own outputWriter and command line options instead of module level globals,
+    so several profiles can be parsed at the same time (threads, asyncio) without overwriting each other.
+    """
+
+    # The columns that identify a row of an artifact, so --baseline can tell a changed row from an added one
+    delta_keys = {}
+    # The artifacts that go into the --timeline, as (timestamp columns, summary columns)
+    timeline_events = {}
+    # Whether the timestamps in the output are in local time instead of UTC
+    local_timestamps = False
+    # The artifacts that go into the --index, as the columns whose text can be searched
+    search_columns = {}
+    # Prefix of the tables in the --sqlite case database, artifacts of different browser families have different columns
+    family = ""
+
+    def __init__(self, user: str, directory: str, output: str, args, browser: str, profile: str = "", checkpoint=None, delta=None):
+        self.user = user
+        self.directory = directory
+        self.args = args
+        self.writer = outputWriter(output, user, browser, profile)
+        self.connections = ConnectionCache()
+        # Records every written artifact in the manifest of the output directory (see lib/manifest.py)
+        self.checkpoint = checkpoint
+        # Compares every artifact with a baseline acquisition of the profile (see lib/delta.py)
+        self.delta = delta
+        # Collects the events of the profile for --timeline (see lib/timeline.py), but not those of a baseline
+        self.timeline = Timeline(output, user, browser, self.local_timestamps) if args.timeline and not (delta and delta.collecting) else None
+        # The tables of the profile for the --sqlite case database (see lib/casedb.py)
+        self.shard = Shard(self.writer.path("case", "sqlite")) if args.sqlite and not (delta and delta.collecting) else None
+        # The text of the profile for the --index full-text search (see lib/search.py)
+        self.search = SearchShard(self.writer.path("search", "sqlite")) if args.index and not (delta and delta.collecting) else None
+
+    def select(self, database: str, table: str, columns: list, timestamps: tuple = ()):
+        """
+        Select columns from a single table, and return the rows in batches.
+        With --table-workers, tables estimated above PARTITION_THRESHOLD rows are split into rowid ranges that are read
+        ahead by a pool of threads, each with its own connection, and merged back in order (see partitioned_batches). The other tables of the same database are
+        read in one go.
+        """
+        connection = self.connections.get(database)
+        statement = select_columns(connection, table, columns, timestamps=timestamps)
+        if self.args.table_workers > 1:
+            try:
+                partitions = rowid_partitions(connection, table) if estimate_rows(connection, table) > PARTITION_THRESHOLD else []
+            except sqlite3.OperationalError:  # WITHOUT ROWID table, read it in one go
+                partitions = []
+            if len(partitions) > 1:
+                return partitioned_batches(database, statement, partitions, self.args.table_workers)
+        return fetch_batches(connection.execute(statement))
+
+    def write(self, datatype: str, headers: list, batches):
+        """Stream the parsed row batches to every format that was requested on the command line, in a single pass."""
+        if self.delta:
+            key_indexes = tuple(headers.index(column) for column in self.delta_keys.get(datatype, ()))
+            if self.delta.collecting:  # This is the baseline, it is only sorted to be compared with later
+                self.delta.collect(datatype, headers, batches, key_indexes)
+                return
+        formats = [extension for extension in FORMATS if getattr(self.args, extension)]
+        outputs = self.writer.outputs(datatype, formats)
+        if self.checkpoint:
+            # batches is a generator, so skipping it skips the parsing as well. The events and the shards of the profile
+            # are only complete when every artifact is parsed in the same run though
+            if self.checkpoint.is_finished(datatype) and not (self.timeline or self.shard or self.search):
+                return
+            self.checkpoint.start(datatype, outputs)
+        if self.timeline and datatype in self.timeline_events:
+            batches = self.timeline.tap(datatype, headers, batches, self.timeline_events[datatype])
+        if self.delta:
+            headers, batches = self.delta.compare(datatype, headers, batches, key_indexes)
+        if self.shard:
+            batches = self.shard.tap(f"{self.family}_{datatype}", headers, batches)
+        if self.search and datatype in self.search_columns:
+            batches = self.search.tap(datatype, headers, batches, self.search_columns[datatype])
+        self.writer.write(datatype, headers, batches, formats)
+        if self.checkpoint:
+            self.checkpoint.record(datatype, outputs)
+
+    def parse_artifacts(self):
+        raise NotImplementedError
+
+    def parse(self):
+        """Parse every artifact of the profile, and close the cached database connections once the profile is done."""
+        try:
+            self.parse_artifacts()
+            if self.delta and not self.delta.collecting:
+                for datatype, headers in self.delta.removed_artifacts():
+                    self.write(datatype, headers, [])
+            if self.timeline:
+                events = self.writer.path("events", "jsonl")
+                self.timeline.write(events)
+                if self.checkpoint:
+                    self.checkpoint.record("events", [events])
+            if self.shard:
+                self.shard.write()
+                if self.checkpoint:
+                    self.checkpoint.record("case", [self.shard.path])
+            if self.search:
+                self.search.write()
+                if self.checkpoint:
+                    self.checkpoint.record("search", [self.search.path])
+            if self.checkpoint:
+                self.checkpoint.complete()
+        finally:
+            self.connections.close_all()
+            if self.timeline:
+                self.timeline.close()
+            if self.shard:
+                self.shard.close()
+            if self.search:
+                self.search.close()
@@ -0,0 +1,156 @@
+import glob
+import html
+import json
+import os
+from collections import Counter
+from datetime import date
+from urllib.parse import urlsplit
+from lib.columnar import column_kind  # type: ignore
+
+# Columns the domains of an artifact are counted from, the first one an artifact has
+DOMAIN_COLUMNS = ("url", "download_url", "page_url", "top_level_url", "origin", "host", "host_key", "hostname", "site")
+# Domains kept per artifact, the top domains of the case are counted from those
+TOP_DOMAINS = 100
+# Timestamps that mean "not set" rather than a day with activity (see lib/timeline.py)
+UNSET_DAYS = ("1601-01-01", "1970-01-01")
+# Bars of the activity histograms on the index page, days are grouped together when there are more
+HISTOGRAM_BARS = 60
+
+
+def domain(value):
+    """The host name of a URL, or of a host column value (".example.com")."""
+    if not isinstance(value, str) or not value:
+        return None
+    if "://" in value:
+        try:
+            return urlsplit(value).hostname
+        except ValueError:
+            return None
+    return value.lstrip(".").split("/")[0] or None
+
+
+def is_day(value: str) -> bool:
+    """Whether value is a YYYY-MM-DD date, rather than the start of "Invalid timestamp" and the like."""
+    try:
+        date.fromisoformat(value)
+    except ValueError:
+        return False
+    return True
+
+
+class Aggregates:
+    """
+    The summary of an artifact for the report index, counted while the rows stream by: the number of rows, the top
+    domains, and the rows per day of its first timestamp column. The days are the days shown in the report.
+    """
+
+    def __init__(self, headers: list):
+        self.rows = 0
+        self.domains = Counter()
+        self.days = Counter()
+        self.domain_index = next((headers.index(column) for column in DOMAIN_COLUMNS if column in headers), None)
+        self.day_column = None
+        self.day_index = None
+        self.headers = headers
+
+    def add(self, batch: list):
+        if self.rows == 0 and batch:  # Timestamp columns are recognized from the first batch, like the Parquet output
+            for index, header in enumerate(self.headers):
+                if column_kind([entry[index] for entry in batch]) == "timestamp":
+                    self.day_column, self.day_index = header, index
+                    break
+        self.rows += len(batch)
+        if self.domain_index is not None:
+            self.domains.update(domain(entry[self.domain_index]) for entry in batch)
+        if self.day_index is not None:
+            self.days.update(str(entry[self.day_index])[:10] for entry in batch if entry[self.day_index])
+
+    def write(self, path: str, artifact: str):
+        """
+        Write the summary as JSON. It only describes the rows, not whose they are, it can be restored from the --cache
+        for another unit with the same inputs.
+        """
+        self.domains.pop(None, None)
+        days = {day: count for day, count in sorted(self.days.items()) if is_day(day) and day not in UNSET_DAYS}
+        summary = dict(artifact=artifact, rows=self.rows, domains=self.domains.most_common(TOP_DOMAINS), day_column=self.day_column, days=days)
+        with open(f"{path}.tmp", "w", encoding="UTF-8") as file:
+            json.dump(summary, file)
+        os.replace(f"{path}.tmp", path)
+
+
+def read_summaries(prefix: str, destination):
+    """
+    The summaries of every artifact of a profile, whose output files start with prefix and are named by
+    destination(artifact, extension), in artifact order. Every summary gets the file name of its report.
+    The prefix of a profile can be the start of that of another profile ("Default" and "Default_2"), the summaries of
+    that other profile are left out.
+    """
+    summaries = []
+    for path in sorted(glob.glob(f"{glob.escape(prefix)}_*.summary.json")):
+        with open(path, "r", encoding="UTF-8") as file:
+            summary = json.load(file)
+        if os.path.abspath(destination(summary["artifact"], "summary.json")) == os.path.abspath(path):
+            summary["report"] = os.path.basename(destination(summary["artifact"], "html"))
+            summaries.append(summary)
+    return summaries
+
+
+def histogram(days: dict) -> str:
+    """An inline SVG bar chart of rows per day, grouped into at most HISTOGRAM_BARS bars."""
+    if not days:
+        return ""
+    first, last = date.fromisoformat(min(days)), date.fromisoformat(max(days))
+    width = max(1, -(-((last - first).days + 1) // HISTOGRAM_BARS))  # Days per bar, rounded up
+    bars = Counter()
+    for day, count in days.items():
+        bars[(date.fromisoformat(day) - first).days // width] += count
+    highest = max(bars.values())
+    rects = "".join(
+        f'<rect x="{bar * 4}" y="{30 - 30 * count / highest:.1f}" width="3" height="{30 * count / highest:.1f}"><title>{count} rows</title></rect>'
+        for bar, count in sorted(bars.items())
+    )
+    label = f"{first} to {last}" + (f", {width} days per bar" if width > 1 else "")
+    return f'<svg width="{(max(bars) + 1) * 4}" height="30" class="histogram"><title>{label}</title>{rects}</svg>'
+
+
+def domain_list(domains: list, limit: int = 5) -> str:
+    return ", ".join(f"{html.escape(name)} ({count})" for name, count in domains[:limit])
+
+
+def write_index(path: str, template: str, units: list, date_generated: str):
+    """
+    Write the index page of the case from the summaries of units, as ((user, browser, profile), summaries).
+    Only the summaries are read, never the reports themselves, so the index is as quick to build and to open for a
+    case of millions of rows as for a small one.
+    """
+    case_rows = 0
+    case_domains = Counter()
+    case_days = Counter()
+    sections = []
+    for (user, browser, profile), summaries in units:
+        rows = []
+        for summary in summaries:
+            days = summary["days"]
+            case_rows += summary["rows"]
+            case_domains.update(dict(summary["domains"]))
+            case_days.update(days)
+            active = f"{min(days)} to {max(days)}" if days else ""
+            rows.append(
+                f'<tr><td><a href="{html.escape(summary["report"])}">{html.escape(summary["artifact"])}</a></td>'
+                f'<td class="number">{summary["rows"]}</td><td>{active}</td><td>{histogram(days)}</td>'
+                f'<td>{domain_list(summary["domains"])}</td></tr>'
+            )
+        title = " / ".join(html.escape(part) for part in (user, browser, profile) if part)
+        sections.append(
+            f"<h3>{title}</h3>\n<table><tr><th>Artifact</th><th>Rows</th><th>Active</th><th>Activity</th><th>Top domains</th></tr>\n"
+            + "\n".join(rows) + "\n</table>"
+        )
+    overview = (
+        f"<p>Rows: <strong>{case_rows}</strong> in <strong>{len(units)}</strong> profiles</p>\n"
+        f"<p>Activity: {histogram(dict(case_days))}</p>\n"
+        f"<p>Top domains: {domain_list(case_domains.most_common(), 20)}</p>"
+    )
+    page = template.replace("{{ date }}", date_generated).replace("{{ overview }}", overview).replace("{{ profiles }}", "\n".join(sections))
+    with open(f"{path}.tmp", "w", encoding="UTF-8") as file:
+        file.write(page)
+    os.replace(f"{path}.tmp", path)
@@ -0,0 +1,60 @@
+import glob
+import heapq
+import os
+import sqlite3
+from lib.database import connect_database  # type: ignore
+
+# Rough parsing throughput of a single worker, measured on CSV output. Only used for the ETA printed by --plan
+BYTES_PER_SECOND = 4 * 1024 * 1024
+
+
+def input_cost(path: str) -> int:
+    """
+    Estimate the work needed to parse a single input, in bytes.
+    For SQLite databases this is page_count x page_size, the data SQLite will actually read (a -wal file next to it
+    is never read, the databases are opened immutable). Directories (LevelDB) count the size of every file in them,
+    anything else (JSON, damaged databases) its size on disk. Missing inputs cost nothing.
+    """
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files)
+    if not os.path.isfile(path):
+        return 0
+    with open(path, "rb") as file:
+        is_sqlite = file.read(16) == b"SQLite format 3\x00"
+    if is_sqlite:
+        connection = connect_database(path)
+        if connection:
+            try:
+                page_count = connection.execute("PRAGMA page_count").fetchone()[0]
+                page_size = connection.execute("PRAGMA page_size").fetchone()[0]
+                return page_count * page_size
+            except sqlite3.DatabaseError:
+                pass
+            finally:
+                connection.close()
+    return os.path.getsize(path)
+
+
+def estimate_cost(directory: str, inputs: tuple) -> int:
+    """
+    Estimate the work for a whole profile, from the inputs its parser reads.
+    Inputs are relative to the profile directory, and can be glob patterns.
+    """
+    return sum(input_cost(path) for name in inputs for path in glob.glob(os.path.join(glob.escape(directory), name)))
+
+
+def longest_first(units: list, costs: dict) -> list:
+    """
+    Order units from the most to the least expensive.
+    Starting the biggest profile last leaves every other worker idle while it finishes, starting it first lets the
+    small ones fill in around it.
+    """
+    return sorted(units, key=lambda unit: costs[unit], reverse=True)
+
+
+def estimate_duration(costs: list, workers: int) -> float:
+    """Estimate the wall clock time in seconds, by handing the costs out largest first to the least busy worker."""
+    busy = [0] * max(workers, 1)
+    for cost in sorted(costs, reverse=True):
+        heapq.heappush(busy, heapq.heappop(busy) + cost)
+    return max(busy) / BYTES_PER_SECOND
@@ -0,0 +1,58 @@
+import sqlite3
+from functools import lru_cache
+
+
+def table_fingerprint(connection, table: str) -> tuple:
+    """
+    Fingerprint a table by its PRAGMA table_info: the (name, type) of every column in order.
+    Two databases with the same fingerprint have the same layout, so they can share a compiled column map.
+    """
+    fingerprint = tuple((column[1], column[2]) for column in connection.execute(f'PRAGMA table_info("{table}")'))
+    if not fingerprint:
+        raise sqlite3.OperationalError(f"no such table: {table}")
+    return fingerprint
+
+
+def chromium_timestamp_sql(column: str) -> str:
+    """
+    SQL expression that formats a Chromium (WebKit epoch, microseconds since 1601-01-01) timestamp column
+    exactly like convert_time does: "YYYY-MM-DD HH:MM:SS", followed by ".ffffff" when there are microseconds.
+    The microseconds are taken modulo 1000000 the way Python floors, so timestamps before 1601 match as well.
+    """
+    seconds = f"(({column} - (({column} % 1000000) + 1000000) % 1000000) / 1000000 - 11644473600)"
+    microseconds = f"((({column} % 1000000) + 1000000) % 1000000)"
+    return (
+        f"datetime({seconds}, 'unixepoch') || "
+        f"CASE WHEN {microseconds} = 0 THEN '' ELSE printf('.%06d', {microseconds}) END"
+    )
+
+
+@lru_cache(maxsize=512)
+def compile_select(table: str, fingerprint: tuple, columns: tuple, timestamps: tuple = ()) -> str:
+    """
+    Build a SELECT for only the requested columns, in the requested order.
+    Columns that don't exist in this version of the schema are selected as NULL, so entry[0], entry[1], ...
+    always refer to the same column regardless of the browser version that wrote the database.
+    Columns listed in timestamps are converted from Chromium time to a datetime string by SQLite.
+    """
+    column_map = {name: index for index, (name, _) in enumerate(fingerprint)}
+    projection = []
+    for column in columns:
+        quoted = f'"{column}"'
+        if column not in column_map:
+            projection.append(f"NULL AS {quoted}")
+        elif column in timestamps:
+            projection.append(f"{chromium_timestamp_sql(quoted)} AS {quoted}")
+        else:
+            projection.append(quoted)
+    return f'SELECT {", ".join(projection)} FROM "{table}"'
+
+
+def select_columns(connection, table: str, columns: list, suffix: str = "", timestamps: tuple = ()) -> str:
+    """
+    Return a SELECT statement for the given columns of table, instead of SELECT * and positional indexing.
+    Large columns the parsers don't output (encrypted_value, favicon bitmaps, ...) are never read from the database.
+    suffix is appended as-is, for ORDER BY / WHERE clauses.
+    """
+    statement = compile_select(table, table_fingerprint(connection, table), tuple(columns), tuple(timestamps))
+    return f"{statement} {suffix}" if suffix else statement
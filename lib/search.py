@@ -0,0 +1,93 @@
+import os
+import sqlite3
+from lib.casedb import Shard  # type: ignore
+
+# Name of the search index in the output directory
+SEARCH_DATABASE = "search.db"
+
+# The trigram tokenizer matches any substring of three characters or more, shorter queries are a full scan
+TRIGRAM = 3
+
+
+class SearchShard(Shard):
+    """
+    The text of a single profile for the search index (--index), one (artifact, text) row per parsed row.
+    Written by the worker of the profile like a case database shard (see lib/casedb.py), and tokenized once by the
+    parent when every profile is done (see build_search_index).
+    """
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self.connection.execute("CREATE TABLE search (artifact TEXT, text TEXT)")
+
+    def tap(self, datatype: str, headers: list, batches, columns: tuple):
+        """Pass the batches through unchanged, adding the text of the columns of every row as they go by."""
+        indexes = [headers.index(column) for column in columns]
+        for batch in batches:
+            texts = ((datatype, " | ".join(str(entry[index]) for index in indexes if entry[index] not in (None, ""))) for entry in batch)
+            self.connection.executemany("INSERT INTO search VALUES (?, ?)", texts)
+            yield batch
+
+
+def trigram_available() -> bool:
+    """Whether the SQLite of this Python has FTS5 and its trigram tokenizer (SQLite 3.34 or later)."""
+    connection = sqlite3.connect(":memory:")
+    try:
+        connection.execute("CREATE VIRTUAL TABLE search USING fts5(text, tokenize = 'trigram')")
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        connection.close()
+    return True
+
+
+def build_search_index(path: str, shards: list):
+    """
+    Build the full-text search index of the case from the search shards of every profile, as (user, browser, profile,
+    shard path). The index is an FTS5 table with the trigram tokenizer, so substring queries use the index as well.
+    It is rebuilt from scratch every run, and merged into a single b-tree at the end for the fastest queries.
+    """
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(f"{path}{suffix}"):
+            os.remove(f"{path}{suffix}")
+    connection = sqlite3.connect(path, isolation_level=None)
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.execute("PRAGMA synchronous = NORMAL")
+    connection.execute(
+        "CREATE VIRTUAL TABLE search USING fts5("
+        "user UNINDEXED, browser UNINDEXED, profile UNINDEXED, artifact UNINDEXED, text, tokenize = 'trigram')"
+    )
+    for user, browser, profile, shard in shards:
+        connection.execute("ATTACH DATABASE ? AS shard", (shard,))
+        connection.execute("BEGIN")
+        connection.execute("INSERT INTO main.search SELECT ?, ?, ?, artifact, text FROM shard.search WHERE text != ''", (user, browser, profile))
+        connection.execute("COMMIT")
+        connection.execute("DETACH DATABASE shard")
+    connection.execute("INSERT INTO search (search) VALUES ('optimize')")
+    connection.close()
+
+
+def search(path: str, query: str, match: bool = False, user: str = None, artifact: str = None, limit: int = 100):
+    """
+    Search the index for query, and return the matching (user, browser, profile, artifact, text) rows.
+    By default query is a case insensitive substring. With match it is an FTS5 query instead, "foo AND bar",
+    "foo OR bar", "NEAR(foo bar)", ..., where every token is itself matched as a substring.
+    """
+    connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        if match:
+            condition, parameters = "search MATCH ?", [query]
+        elif len(query) >= TRIGRAM:
+            condition, parameters = "search MATCH ?", ['"' + query.replace('"', '""') + '"']
+        else:
+            condition, parameters = "text LIKE ? ESCAPE '\\'", ["%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"]
+        if user:
+            condition += " AND user = ?"
+            parameters.append(user)
+        if artifact:
+            condition += " AND artifact = ?"
+            parameters.append(artifact)
+        statement = f"SELECT user, browser, profile, artifact, text FROM search WHERE {condition} LIMIT ?"
+        return connection.execute(statement, (*parameters, limit)).fetchall()
+    finally:
+        connection.close()
@@ -0,0 +1,83 @@
+import heapq
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from lib.extsort import ExternalSort  # type: ignore
+
+TIMELINE_HEADERS = ["timestamp", "user", "browser", "artifact", "summary"]
+
+# Timestamps that mean "not set" rather than an actual event: the Chromium and Unix epochs
+UNSET_TIMESTAMPS = ("1601-01-01 00:00:00.000000", "1970-01-01 00:00:00.000000")
+
+
+def normalize_timestamp(value, local: bool = False):
+    """
+    Turn the timestamp of a parsed row into "YYYY-MM-DD HH:MM:SS.ffffff" in UTC, so events of every browser sort
+    as plain strings. local is for parsers that output the local time of the machine running the parser (Firefox).
+    Returns None for empty, unset or unreadable timestamps, those rows don't become events.
+    """
+    if not value:
+        return None
+    try:
+        timestamp = datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+    if local:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    normalized = timestamp.strftime("%Y-%m-%d %H:%M:%S.%f")
+    return None if normalized in UNSET_TIMESTAMPS else normalized
+
+
+class Timeline:
+    """
+    Collects the events of a single profile for the super-timeline (--timeline).
+    Artifacts listed in the timeline of a parser are tapped while they are written: every timestamp column of a row
+    becomes a (timestamp, user, browser, artifact, summary) event. The events are sorted on disk, and written to the
+    events file of the profile in order, so the timeline of the whole case is a k-way merge of those files.
+    """
+
+    def __init__(self, output: str, user: str, browser: str, local: bool = False):
+        self.user = user
+        self.browser = browser
+        self.local = local
+        self.directory = tempfile.mkdtemp(dir=output, prefix=".timeline-")
+        self.events = ExternalSort(self.directory)
+
+    def tap(self, datatype: str, headers: list, batches, spec: tuple):
+        """Pass the batches through unchanged, adding the events in them as they go by."""
+        timestamps, summary = spec
+        timestamp_indexes = [(column, headers.index(column)) for column in timestamps]
+        summary_indexes = [headers.index(column) for column in summary]
+        for batch in batches:
+            events = []
+            for entry in batch:
+                text = " | ".join(str(entry[index]) for index in summary_indexes if entry[index] not in (None, ""))
+                for column, index in timestamp_indexes:
+                    timestamp = normalize_timestamp(entry[index], self.local)
+                    if timestamp:
+                        artifact = f"{datatype} {column}" if len(timestamps) > 1 else datatype
+                        events.append((timestamp, self.user, self.browser, artifact, text))
+            self.events.add(events)
+            yield batch
+
+    def write(self, path: str):
+        """Write the events in order as JSON Lines. The file only appears once it is complete."""
+        with open(f"{path}.tmp", "w", encoding="UTF-8") as file:
+            file.writelines(json.dumps(event) + "\n" for event in self.events)
+        os.replace(f"{path}.tmp", path)
+
+    def close(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def read_events(path: str):
+    with open(path, "r", encoding="UTF-8") as file:
+        for line in file:
+            yield json.loads(line)
+
+
+def merge_events(paths: list):
+    """Merge the sorted events files of every profile into a single time ordered stream, one event per file in memory."""
+    return heapq.merge(*(read_events(path) for path in paths))
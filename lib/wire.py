@@ -0,0 +1,65 @@
+# Protobuf wire types, the low 3 bits of the key of every field (groups are long deprecated, and not supported)
+VARINT = 0
+FIXED64 = 1
+LENGTH_DELIMITED = 2
+FIXED32 = 5
+
+
+def read_varint(data, position: int):
+    """Decode the varint at position, returns (value, position after it). Used by protobuf and LevelDB alike."""
+    result = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, position
+        shift += 7
+
+
+def signed(value: int, bits: int = 64) -> int:
+    """
+    An int32 / int64 varint as the signed number it is, negative numbers are stored in two's complement.
+    Like protobuf itself, only the low bits of the field's size are kept.
+    """
+    value &= (1 << bits) - 1
+    return value - (1 << bits) if value >= 1 << (bits - 1) else value
+
+
+def scan_fields(data, wanted: dict) -> dict:
+    """
+    Read the fields of a serialized message listed in wanted, {field number: wire type}, without parsing the rest.
+    Returns {field number: value}, varints and fixed fields as int, length-delimited fields as bytes (strings,
+    embedded messages). The fields that aren't wanted are skipped by their length, so large blobs are never copied.
+    Raises ValueError (or IndexError) when the message is damaged, or isn't laid out the simple way this expects: a
+    wanted field with an unexpected wire type, or one that occurs more than once (an embedded message in parts).
+    Those are left to the full protobuf parser.
+    """
+    fields = {}
+    position = 0
+    end = len(data)
+    while position < end:
+        key, position = read_varint(data, position)
+        number, wire_type = key >> 3, key & 7
+        if wire_type == VARINT:
+            value, position = read_varint(data, position)
+        elif wire_type == LENGTH_DELIMITED:
+            size, position = read_varint(data, position)
+            value = data[position:position + size] if number in wanted else None
+            position += size
+        elif wire_type == FIXED64:
+            value = int.from_bytes(data[position:position + 8], "little")
+            position += 8
+        elif wire_type == FIXED32:
+            value = int.from_bytes(data[position:position + 4], "little")
+            position += 4
+        else:
+            raise ValueError(f"Unsupported wire type {wire_type}")
+        if number in wanted:
+            if wanted[number] != wire_type or number in fields:
+                raise ValueError(f"Field {number} needs the full parser")
+            fields[number] = value
+    if position != end:
+        raise ValueError("Truncated message")
+    return fields
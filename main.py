@@ -1,11 +1,147 @@
 import argparse
+import datetime
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from lib.detectBrowser import locate_browser_directories
-from lib.firefox import parse_firefox_data
-from lib.edge import parse_edge_data
-from lib.chrome import parse_chrome_data
-from lib.opera import parse_opera_data
-from lib.brave import parse_brave_data
-from lib.yandex import parse_yandex_data
+from lib.firefox import FirefoxParser, parse_firefox_data
+from lib.chromium import BROWSERS, ChromiumParser, parse_chromium_data
+from lib.casedb import merge_shards
+from lib.cache import ResultCache, cache_key
+from lib.database import iter_batches
+from lib.columnar import pyarrow
+from lib.delta import Delta
+from lib.manifest import Checkpoint, hash_inputs, load_manifest, prepare_manifest
+from lib.output import FORMATS, load_template, outputWriter
+from lib.report import read_summaries, write_index
+from lib.scheduler import BYTES_PER_SECOND, estimate_cost, estimate_duration, longest_first
+from lib.search import SEARCH_DATABASE, build_search_index, search, trigram_available
+from lib.timeline import TIMELINE_HEADERS, merge_events
+
+
+CHROMIUM_BROWSERS = {browser.title: browser for browser in BROWSERS}
+
+
+def collect_units(directories):
+    """Flatten the output of locate_browser_directories into (user, browser, profile) work units."""
+    units = []
+    for user in directories.keys():
+        for directory in directories[user]:
+            # Every profile is its own unit, so profiles of the same browser are parsed in parallel as well
+            for profile in directories[user][directory]:
+                units.append((user, directory, profile.replace("//", "/")))
+    return units
+
+
+def describe_unit(unit):
+    user, browser, profile = unit
+    return f"{browser} profile {profile.split('/')[-1]} ({user})"
+
+
+def unit_inputs(unit):
+    """The inputs the parser of a unit reads, relative to the profile directory."""
+    user, browser, profile = unit
+    if browser == "Firefox":
+        return FirefoxParser.inputs
+    return ChromiumParser.inputs + CHROMIUM_BROWSERS[browser].cookies
+
+
+def unit_writer(unit, output):
+    """The outputWriter the parser of a unit uses, which knows the path of each of its outputs."""
+    user, browser, profile = unit
+    name = "firefox" if browser == "Firefox" else CHROMIUM_BROWSERS[browser].name
+    return outputWriter(output, user, name, profile.split("/")[-1])
+
+
+def cache_options(unit, args):
+    """Everything besides the inputs that changes the output of a unit, and so is part of its cache key."""
+    user, browser, profile = unit
+    options = {"browser": browser, "formats": [extension for extension in FORMATS if getattr(args, extension)], "sql_timestamps": args.sql_timestamps, "timezone": time.tzname, "delta": bool(args.baseline), "timeline": args.timeline, "sqlite": bool(args.sqlite), "index": args.index}
+    if args.html or args.timeline:  # The HTML report shows the user, and so does every event of the timeline
+        options["user"] = user
+    return options
+
+
+def unit_cost(unit):
+    """Estimate the work for a unit, from the size of the databases its parser will read."""
+    return estimate_cost(unit[2], unit_inputs(unit))
+
+
+def print_plan(units, costs, workers):
+    """Print the units in the order they will be dispatched, with the estimated work, without parsing anything."""
+    for unit in units:
+        print(f"[*] {costs[unit] / 1024 / 1024:10.1f} MiB  ~{costs[unit] / BYTES_PER_SECOND:7.1f}s  {describe_unit(unit)}")
+    total = sum(costs.values())
+    duration = estimate_duration(list(costs.values()), workers)
+    print(f"[*] {len(units)} units, {total / 1024 / 1024:.1f} MiB in total, estimated {duration:.0f}s with {workers} worker(s)")
+
+
+def parse_profile(unit, directory, output, args, checkpoint=None, delta=None):
+    """Parse the profile of a unit in directory, which is either the unit itself or its baseline."""
+    user, browser, profile = unit
+    if browser == "Firefox":
+        parse_firefox_data(user, directory, profile.split("/")[-1], output, args, checkpoint, delta)
+    else:
+        parse_chromium_data(CHROMIUM_BROWSERS[browser], user, directory, profile.split("/")[-1], output, args, checkpoint, delta)
+
+
+def baseline_directory(unit, args):
+    """The same profile in the --baseline acquisition, at the same path relative to the source directory."""
+    return os.path.join(args.baseline, os.path.relpath(unit[2], args.directory))
+
+
+def parse_unit(unit, output, args, records=()):
+    """
+    Parse a single unit. Never raises, so one damaged profile doesn't take down the rest of the run.
+    records are the manifest records of an earlier run for this unit, used with --resume.
+    """
+    user, browser, profile = unit
+    start = time.perf_counter()
+    try:
+        digests = args.resume or bool(args.cache)  # Only hash the evidence when the hashes are used
+        inputs = hash_inputs(profile, unit_inputs(unit), digests)
+        if args.baseline:  # The delta changes when either side does
+            inputs.update((f"baseline/{name}", entry) for name, entry in hash_inputs(baseline_directory(unit, args), unit_inputs(unit), digests).items())
+        checkpoint = Checkpoint(output, user, browser, profile, profile.split("/")[-1], inputs, records, args.resume)
+        cache = ResultCache(args.cache, args.cache_size * 1024 * 1024) if args.cache else None
+        key = cache_key(checkpoint.inputs, cache_options(unit, args)) if cache else None
+        if checkpoint.is_complete():  # Not parsed at all, so no time is reported either (see report_unit)
+            return unit, None, None
+        if cache and (restored := cache.restore(key, unit_writer(unit, output).path)) is not None:
+            print(f"[*] Restored {describe_unit(unit)} from the cache, identical inputs were parsed before")
+            for artifact, outputs in restored.items():
+                checkpoint.record(artifact, outputs)
+            checkpoint.complete()
+            return unit, None, time.perf_counter() - start
+        if args.baseline:
+            # The sorted runs of both sides can be as big as the tables themselves, so they go next to the output
+            with tempfile.TemporaryDirectory(dir=output, prefix=".delta-") as directory:
+                delta = Delta(directory)
+                if os.path.isdir(baseline_directory(unit, args)):  # Without a baseline, every row was added
+                    parse_profile(unit, baseline_directory(unit, args), output, args, delta=delta)
+                delta.collecting = False
+                parse_profile(unit, profile, output, args, checkpoint, delta)
+        else:
+            parse_profile(unit, profile, output, args, checkpoint)
+        # Only a unit parsed from start to finish is cached, not one that was resumed halfway through
+        if cache and not (args.resume and checkpoint.finished):
+            cache.store(key, checkpoint.written, checkpoint.starts)
+    except Exception as e:
+        return unit, f"{type(e).__name__}: {e}", time.perf_counter() - start
+    return unit, None, time.perf_counter() - start
+
+
+def report_unit(result):
+    unit, error, elapsed = result
+    if error:
+        print(f"[!] Failed parsing {describe_unit(unit)} after {elapsed:.1f}s: {error}")
+    elif elapsed is None:
+        print(f"[*] Skipping {describe_unit(unit)}, it was finished by an earlier run")
+    else:
+        print(f"[*] Finished parsing {describe_unit(unit)} in {elapsed:.1f}s")
 
 
 def main(args):
@@ -13,48 +149,165 @@ def main(args):
     output = args.output
     if output[-1] != "/":
         output += "/"
-    for user in directories.keys():
-        for directory in directories[user]:
-            if directory == "Firefox":
-                for profile in directories[user][directory]:
-                    parse_firefox_data(user, profile.replace("//", "/"), profile.split("/")[-1], output, args)
-                    print(f"[*] Finished parsing Firefox profile {profile.split('/')[-1]}")
+    units = collect_units(directories)
+    costs = {unit: unit_cost(unit) for unit in units}
+    # Dispatch the biggest profiles first, so a single huge places.sqlite doesn't start last and delay the whole run
+    scheduled = longest_first(units, costs)
+    results = {}
+
+    if args.plan:
+        print_plan(scheduled, costs, args.workers)
+        return []
+
+    # Every finished artifact is recorded in the manifest, so an interrupted run can be picked up with --resume
+    records = load_manifest(output) if args.resume else {}
+    prepare_manifest(output, args.resume)
+    if args.cache:  # Apply a smaller --cache-size before anything is restored from it
+        ResultCache(args.cache, args.cache_size * 1024 * 1024).evict()
+
+    if args.workers > 1:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            futures = {pool.submit(parse_unit, unit, output, args, records.get(unit, ())): unit for unit in scheduled}
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:  # The worker itself died (killed for its memory, ...), parse_unit never raises
+                    result = futures[future], f"{type(e).__name__}: {e}", 0.0
+                report_unit(result)
+                results[futures[future]] = result
+    else:
+        for unit in scheduled:
+            result = parse_unit(unit, output, args, records.get(unit, ()))
+            report_unit(result)
+            results[unit] = result
+
+    if args.timeline:
+        write_timeline(units, output, args)
+    if args.sqlite:
+        write_case_database(units, output, args)
+    if args.index:
+        write_search_index(units, output)
+    if args.html:
+        write_report_index(units, output, args)
+
+    # Units finish in whatever order the pool schedules them, so summarise in discovery order
+    return [results[unit] for unit in units]
+
 
-            if directory == "Chrome":
+def write_timeline(units, output, args):
+    """Merge the events of every profile into a single time ordered timeline of the whole case."""
+    paths = [path for path in (unit_writer(unit, output).path("events", "jsonl") for unit in units) if os.path.exists(path)]
+    formats = [extension for extension in FORMATS if getattr(args, extension)]
+    outputWriter(output, "all", "browsers").write("timeline", TIMELINE_HEADERS, iter_batches(merge_events(paths)), formats)
+    print(f"[*] Wrote the timeline of {len(paths)} profiles")
 
-                parse_chrome_data(user, directories[user][directory].replace("//", "/"), output, args)
-                print("[*] Finished parsing Chrome")
 
-            if directory == "Edge":
-                parse_edge_data(user, directories[user][directory].replace("//", "/"), output, args)
-                print("[*] Finished parsing Edge")
+def write_report_index(units, output, args):
+    """Write the index page of the HTML reports of the case, from the summaries written along with every report."""
+    writers = [unit_writer(unit, output) for unit in units]
+    if args.timeline:
+        writers.append(outputWriter(output, "all", "browsers"))
+    profiles = [((writer.user, writer.browser, writer.profile), read_summaries(writer.filename, writer.path)) for writer in writers]
+    iso_time = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    write_index(os.path.join(output, "index.html"), load_template("template_index.html"), profiles, iso_time)
+    print(f"[*] Wrote the report index of {len(units)} profiles to {os.path.join(output, 'index.html')}")
 
-            if directory == "Opera":
-                parse_opera_data(user, directories[user][directory.replace("//", "/")], output, args)
-                print("[*] Finished parsing Opera")
 
-            if directory == "Brave":
-                parse_brave_data(user, directories[user][directory.replace("//", "/")], output, args)
-                print("[*] Finished parsing Brave")
+def unit_shards(units, output, datatype):
+    """The (user, browser, profile, path) of the shards every profile wrote for datatype."""
+    shards = []
+    for unit in units:
+        writer = unit_writer(unit, output)
+        if os.path.exists(writer.path(datatype, "sqlite")):
+            shards.append((writer.user, writer.browser, writer.profile, writer.path(datatype, "sqlite")))
+    return shards
 
-            if directory == "Yandex":
-                parse_yandex_data(user, directories[user][directory.replace("//", "/")], output, args)
-                print("[*] Finished parsing Yandex")
+
+def write_case_database(units, output, args):
+    """Merge the shards of every profile into the --sqlite case database."""
+    shards = unit_shards(units, output, "case")
+    merge_shards(args.sqlite, shards)
+    print(f"[*] Wrote the case database of {len(shards)} profiles to {args.sqlite}")
+
+
+def write_search_index(units, output):
+    """Build the --index full-text search index of the case from the search shards of every profile."""
+    shards = unit_shards(units, output, "search")
+    build_search_index(os.path.join(output, SEARCH_DATABASE), shards)
+    print(f"[*] Wrote the search index of {len(shards)} profiles to {os.path.join(output, SEARCH_DATABASE)}")
+
+
+def search_main(parser, args):
+    """main.py --search <output> <query>: search the --index of an earlier run."""
+    output, query = args.search
+    path = os.path.join(output, SEARCH_DATABASE)
+    if not os.path.exists(path):
+        parser.error(f"{path} does not exist, parse the case with --index first")
+    start = time.perf_counter()
+    results = search(path, query, args.match, args.user, args.artifact, args.limit)
+    elapsed = time.perf_counter() - start
+    for result in results:
+        print("\t".join(result))
+    print(f"[*] {len(results)} results in {elapsed * 1000:.1f} ms")
+
+
+def print_summary(results):
+    failed = [result for result in results if result[1]]
+    print(f"[*] Parsed {len(results) - len(failed)}/{len(results)} units")
+    for unit, error, _ in failed:
+        print(f"[!] {describe_unit(unit)}: {error}")
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="BrowserParser parses most of all relevant browser artifacts, from the output of KAPE")
-    
-    parser.add_argument("directory")
-    parser.add_argument("output")
 
-    # Create a mutually exclusive group
-    group = parser.add_mutually_exclusive_group(required=True)
+    parser.add_argument("directory", nargs="?")
+    parser.add_argument("output", nargs="?")
+    parser.add_argument("--workers", type=int, default=1, help="Number of processes used to parse profiles in parallel")
+    parser.add_argument("--sql-timestamps", action="store_true", help="Convert Chromium timestamps inside SQLite instead of in Python")
+    parser.add_argument("--table-workers", type=int, default=1, help="Number of threads used to read very large tables ahead, split by rowid range, and of processes used to decode notifications")
+
+    parser.add_argument("--resume", action="store_true", help="Skip the units and artifacts an earlier, interrupted run into the same output directory already finished")
+    parser.add_argument("--cache", metavar="DIR", help="Reuse the output of profiles with byte-identical inputs (live volume, Volume Shadow Copies, earlier cases) from this cache directory")
+    parser.add_argument("--cache-size", type=int, default=10240, help="Size in MiB the cache directory is kept under, by evicting the least recently used results (default 10240)")
+    parser.add_argument("--baseline", metavar="DIR", help="An earlier acquisition (KAPE output, shadow copy, ...) of the same system. Only the rows that were added, removed or changed since are written")
+    parser.add_argument("--timeline", action="store_true", help="Also merge the events (history, downloads, cookies, form history, notifications, ...) of every user and browser into one time ordered timeline")
+    parser.add_argument("--plan", action="store_true", help="Print the units that would be parsed, largest first, with the estimated work and duration, and exit")
+
+    # Any combination of formats can be written, from a single parse of the evidence
+    group = parser.add_argument_group("output formats", "At least one is required")
     group.add_argument("--csv", action="store_true", help="Output in CSV format")
     group.add_argument("--json", action="store_true", help="Output in JSON format")
+    group.add_argument("--jsonl", action="store_true", help="Output in JSON Lines format, appended to existing output")
     group.add_argument("--html", action="store_true", help="Output in HTML format")
-    
-    # Add arguments to the group
+    group.add_argument("--parquet", action="store_true", help="Output in Parquet format, with native timestamp and dictionary encoded columns (requires pyarrow)")
+    group.add_argument("--sqlite", metavar="CASE_DB", help="Load every artifact of every user and browser into a single, indexed SQLite database")
+    group.add_argument("--arrow", action="store_true", help="Output in Arrow IPC format, with the same columns as --parquet (requires pyarrow)")
+    group.add_argument("--index", action="store_true", help=f"Build a full-text search index of every user and browser in <output>/{SEARCH_DATABASE}, searched with: main.py --search <output> <query>")
+
+    # Searching the index of a case parsed earlier, instead of parsing one
+    group = parser.add_argument_group("search", "Search the full-text index of a case parsed with --index, instead of parsing")
+    group.add_argument("--search", nargs=2, metavar=("OUTPUT", "QUERY"), help="Find the query anywhere in a title, URL, search term, form field, notification, download, ... of the case in OUTPUT")
+    group.add_argument("--match", action="store_true", help="The query is an FTS5 query instead of a substring, like: 'invoice AND \"wire transfer\"'")
+    group.add_argument("--user", help="Only search the artifacts of this user")
+    group.add_argument("--artifact", help="Only search this artifact (history, downloads, formhistory, ...)")
+    group.add_argument("--limit", type=int, default=100, help="Maximum number of results (default 100)")
+
     args = parser.parse_args()
-    main(args)
-    print("[*] Done parsing!")
+    if args.search:
+        if args.directory:
+            parser.error("--search searches the output of an earlier run, it takes no source directory")
+        search_main(parser, args)
+        sys.exit()
+    if not args.output:
+        parser.error(f"the following arguments are required: {'output' if args.directory else 'directory, output'}")
+    if not any(getattr(args, extension) for extension in FORMATS) and not (args.sqlite or args.index):
+        parser.error("at least one output format is required: --csv, --json, --jsonl, --html, --parquet, --arrow, --sqlite or --index")
+    if (args.parquet or args.arrow) and pyarrow is None:
+        parser.error("--parquet and --arrow require pyarrow, install it with: pip install pyarrow")
+    if args.index and not trigram_available():  # Found out before parsing, not when the index is built at the end
+        parser.error(f"--index requires the FTS5 trigram tokenizer of SQLite 3.34 or later, this Python has SQLite {sqlite3.sqlite_version}")
+    results = main(args)
+    if not args.plan:
+        print_summary(results)
+        print("[*] Done parsing!")
@@ -0,0 +1,27 @@
+import os
+import sqlite3
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_case(directory: str, users=("alice",), rows: int = 51) -> str:
+    """A KAPE like collection with a Chrome profile per user, holding only a History database with rows urls."""
+    for user in users:
+        profile = os.path.join(directory, "C", "Users", user, "AppData", "Local", "Google", "Chrome", "User Data", "Default")
+        os.makedirs(profile)
+        connection = sqlite3.connect(os.path.join(profile, "History"))
+        connection.execute("CREATE TABLE urls (id INTEGER PRIMARY KEY, url TEXT, title TEXT, visit_count INTEGER, last_visit_time INTEGER)")
+        connection.executemany(
+            "INSERT INTO urls (url, title, visit_count, last_visit_time) VALUES (?, ?, ?, ?)",
+            ((f"https://example{i}.com/", f"Example {i}", i, 13350000000000000 + i) for i in range(rows)),
+        )
+        connection.commit()
+        connection.close()
+    return directory
+
+
+def run_main(*arguments, cwd: str = ROOT) -> subprocess.CompletedProcess:
+    """Run main.py like it is run from the command line."""
+    return subprocess.run([sys.executable, os.path.join(ROOT, "main.py"), *arguments], cwd=cwd, capture_output=True, text=True)
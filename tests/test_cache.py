@@ -0,0 +1,44 @@
+import json
+import os
+import tempfile
+import unittest
+from tests.case import make_case, run_main
+
+
+class TestCache(unittest.TestCase):
+    def test_restore_after_two_runs_into_the_same_output(self):
+        """The JSON and JSON Lines outputs add to those of earlier runs, the cache only holds the rows of the unit."""
+        with tempfile.TemporaryDirectory() as directory:
+            case = make_case(os.path.join(directory, "case"), rows=51)
+            cache = os.path.join(directory, "cache")
+            first = os.path.join(directory, "first")
+            fresh = os.path.join(directory, "fresh")
+            os.makedirs(first)
+            os.makedirs(fresh)
+            for _ in range(2):
+                result = run_main(case, first, "--jsonl", "--json", "--cache", cache)
+                self.assertEqual(result.returncode, 0, result.stderr)
+
+            # The second run was restored from the cache, and added to the output of the first
+            self.assertEqual(len(read_jsonl(os.path.join(first, "alice_chrome_Default_history.jsonl"))), 102)
+            self.assertEqual(len(read_json(os.path.join(first, "alice_chrome_Default_history.json"))), 102)
+
+            result = run_main(case, fresh, "--jsonl", "--json", "--cache", cache)
+            self.assertEqual(result.returncode, 0, result.stderr)
+            self.assertIn("Restored", result.stdout)
+            self.assertEqual(len(read_jsonl(os.path.join(fresh, "alice_chrome_Default_history.jsonl"))), 51)
+            self.assertEqual(len(read_json(os.path.join(fresh, "alice_chrome_Default_history.json"))), 51)
+
+
+def read_jsonl(path: str) -> list:
+    with open(path, "r", encoding="UTF-8") as file:
+        return [json.loads(line) for line in file]
+
+
+def read_json(path: str) -> list:
+    with open(path, "r", encoding="UTF-8") as file:
+        return json.load(file)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,30 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from lib.casedb import Shard, merge_shards
+
+
+class TestMergeShards(unittest.TestCase):
+    def test_column_types_of_every_shard(self):
+        """A column that is INTEGER in the first shard and TEXT in a later one is TEXT in the case database."""
+        with tempfile.TemporaryDirectory() as directory:
+            shards = []
+            for user, rows in (("alice", [[1, 2]]), ("bob", [["0123", 2.5]])):
+                shard = Shard(os.path.join(directory, f"{user}_case.sqlite"))
+                list(shard.tap("chromium_history", ["code", "count"], [rows]))
+                shard.write()
+                shards.append((user, "chrome", "Default", shard.path))
+            path = os.path.join(directory, "case.db")
+            merge_shards(path, shards)
+
+            connection = sqlite3.connect(path)
+            declared = [column[2] for column in connection.execute("PRAGMA table_info(chromium_history)")]
+            rows = connection.execute("SELECT user, code, count FROM chromium_history ORDER BY user").fetchall()
+            connection.close()
+            self.assertEqual(declared, ["TEXT", "TEXT", "TEXT", "TEXT", "REAL"])
+            self.assertEqual(rows, [("alice", "1", 2.0), ("bob", "0123", 2.5)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+import os
+import tempfile
+import unittest
+from lib.leveldb import FULL, LevelDB, TYPE_DELETION, TYPE_VALUE
+
+
+def write_log(path: str, sequence: int, operations: list):
+    """A log file with a single write batch of (key, value) puts, and (key, None) deletions."""
+    batch = sequence.to_bytes(8, "little") + len(operations).to_bytes(4, "little")
+    for key, value in operations:
+        if value is None:
+            batch += bytes([TYPE_DELETION, len(key)]) + key
+        else:
+            batch += bytes([TYPE_VALUE, len(key)]) + key + bytes([len(value)]) + value
+    with open(path, "wb") as file:
+        file.write(b"\0\0\0\0" + len(batch).to_bytes(2, "little") + bytes([FULL]) + batch)
+
+
+class TestLevelDB(unittest.TestCase):
+    def test_live_and_recovered_records(self):
+        with tempfile.TemporaryDirectory() as directory:
+            operations = [(b"DATA:a", b"1"), (b"DATA:b", b"2"), (b"DATA:a", b"3"), (b"DATA:b", None), (b"NEXT", b"4"), (b"DATA:a", b"5")]
+            write_log(os.path.join(directory, "000003.log"), 1, operations)
+            # A log that was compacted, but not removed yet, has the same records again
+            write_log(os.path.join(directory, "000005.log"), 1, operations)
+            db = LevelDB(directory)
+
+            self.assertEqual(list(db.iterator(prefix=b"DATA:")), [(b"DATA:a", b"5")])
+            recovered = [(state, record.key, record.value, record.sequence) for state, record in db.recovered(prefix=b"DATA:")]
+            self.assertEqual(recovered, [("overwritten", b"DATA:a", b"1", 1), ("overwritten", b"DATA:a", b"3", 3), ("deleted", b"DATA:b", b"2", 2)])
+            self.assertEqual(len(list(db.entries())), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
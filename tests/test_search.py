@@ -0,0 +1,41 @@
+import os
+import tempfile
+import unittest
+from tests.case import make_case, run_main
+
+
+class TestSearch(unittest.TestCase):
+    def test_search_option(self):
+        """--search finds the rows of a case parsed with --index, --user narrows them down."""
+        with tempfile.TemporaryDirectory() as directory:
+            case = make_case(os.path.join(directory, "case"), users=("alice", "bob"), rows=20)
+            output = os.path.join(directory, "output")
+            os.makedirs(output)
+            result = run_main(case, output, "--index")
+            self.assertEqual(result.returncode, 0, result.stderr)
+
+            result = run_main("--search", output, "example13.com")
+            self.assertEqual(result.returncode, 0, result.stderr)
+            self.assertIn("[*] 2 results", result.stdout)
+            result = run_main("--search", output, "example13.com", "--user", "bob")
+            self.assertEqual(result.returncode, 0, result.stderr)
+            self.assertIn("[*] 1 results", result.stdout)
+
+    def test_source_directory_named_search(self):
+        """A source directory named search is parsed, not taken for a subcommand."""
+        with tempfile.TemporaryDirectory() as directory:
+            make_case(os.path.join(directory, "search"), rows=20)
+            os.makedirs(os.path.join(directory, "output"))
+            result = run_main("search", "output", "--csv", cwd=directory)
+            self.assertEqual(result.returncode, 0, result.stderr)
+            self.assertTrue(os.path.exists(os.path.join(directory, "output", "alice_chrome_Default_history.csv")))
+
+    def test_search_without_index(self):
+        with tempfile.TemporaryDirectory() as directory:
+            result = run_main("--search", directory, "invoice")
+            self.assertNotEqual(result.returncode, 0)
+            self.assertIn("parse the case with --index first", result.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()